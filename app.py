@@ -1,5 +1,9 @@
-from flask import Flask, render_template, request, redirect, url_for, session
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, Response
 import os
+import json
+import hmac
+import time
+import uuid
 import logging
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
@@ -12,28 +16,58 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__, static_folder='static')
 app.secret_key = os.getenv('SECRET_KEY', 'fallback-secret-key-change-in-production')
 
-image_path = []
-latexs = []
-extracted_text = []
-audio_path = []
-image1 = []
-
 UPLOAD_FOLDER = 'uploads'
 OUTPUT_FOLDER = 'static/output_files'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# How often a result stream checks its job for new pages, and how long it
+# may stay silent before sending a keep-alive comment
+STREAM_POLL_SECONDS = float(os.getenv('STREAM_POLL_SECONDS', '0.5'))
+STREAM_KEEPALIVE_SECONDS = 15
+# A stream holds a gthread worker thread, so it ends after STREAM_MAX_SECONDS;
+# the browser reconnects STREAM_RETRY_MS later and resumes from Last-Event-ID
+STREAM_MAX_SECONDS = float(os.getenv('STREAM_MAX_SECONDS', '10'))
+STREAM_RETRY_MS = int(os.getenv('STREAM_RETRY_MS', '3000'))
+
+# Token for the /admin endpoints, sent as X-Admin-Token; they can delete files,
+# so they answer 404 while it is unset
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+# Annotated pages and segments shown per page of /result and /equations
+RESULT_PAGES_PER_VIEW = int(os.getenv('RESULT_PAGES_PER_VIEW', '10'))
+RESULT_SEGMENTS_PER_VIEW = int(os.getenv('RESULT_SEGMENTS_PER_VIEW', '25'))
+
+# Download missing model files on a background thread instead of blocking startup
+MODEL_DOWNLOAD_BACKGROUND = os.getenv('MODEL_DOWNLOAD_BACKGROUND', '0') == '1'
+
 # Import model downloader
-from model_downloader import ensure_models_exist
+from model_downloader import (ensure_models_exist, ensure_models_in_background, models_ready,
+                              missing_models_reason, download_status)
+
+# The pipelines (torch, cv2, groq, gTTS, Gemini) are imported by the routes
+# and jobs that use them, so a worker can serve pages before they load
+from your_colab_code.model_registry import warm_up, model_stats, yolo_class_names, process_memory
+from your_colab_code.page_source import parse_page_ranges, format_page_ranges, check_pages_exist
+
+# Background job runner
+from job_queue import JobQueue, DONE, FAILED
+
+# Results of earlier uploads, keyed by PDF hash
+from result_cache import ResultCache, save_and_hash
 
-# Import your existing Colab code here — wrap into a function
-from your_colab_code.main import process_pdf
+# Finished ML results, keyed by job id and read a slice at a time
+from result_store import ResultStore
 
-# Import Gemini integration
-from gemini_integration import process_document_with_gemini
+# Disk quotas and age/LRU eviction for uploads and static/ artifacts
+from retention import RetentionManager
+
+# Per-stage timing spans, exported for Prometheus
+from tracing import render_metrics
 
 def initialize_app():
     """Initialize application and download required models"""
     logger.info("Initializing application...")
+    start_time = time.time()
     
     # Create necessary directories
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -42,13 +76,189 @@ def initialize_app():
     os.makedirs('static/outputs', exist_ok=True)
     os.makedirs('static/page_images', exist_ok=True)
     os.makedirs('static/segmentated_images', exist_ok=True)
+    os.makedirs('static/jobs', exist_ok=True)
+    
+    # Download model files if needed. In the background, pages and Gemini
+    # uploads are served right away and ML uploads wait for the files.
+    if MODEL_DOWNLOAD_BACKGROUND:
+        ensure_models_in_background()
+    else:
+        ensure_models_exist()
+    
+    # Load the pipelines and YOLO/LatexOCR up front instead of on the first
+    # upload. Under gunicorn's preload_app this happens once in the master and
+    # the forked workers share the weights copy-on-write. With background
+    # downloads the models load on the first ML upload instead.
+    if os.getenv('WARM_UP_MODELS', '1') == '1' and not MODEL_DOWNLOAD_BACKGROUND:
+        import your_colab_code.main
+        import gemini_integration
+        for name, stats in warm_up().items():
+            logger.info(f"Model {name} ready in {stats['load_seconds']}s (+{stats['rss_delta_mb']} MB)")
     
-    # Download model files if needed
-    ensure_models_exist()
-    logger.info("Application initialized successfully")
+    memory = process_memory()
+    logger.info(f"Application initialized in {time.time() - start_time:.2f}s "
+                f"(pid {os.getpid()}, RSS {memory['rss_mb']} MB)")
+
+@app.template_filter('public_url')
+def public_url(path):
+    """Turn a stored 'static/...' path into a URL that works from any page"""
+    if not path or path.startswith(('/', 'http://', 'https://')):
+        return path
+    return '/' + path.replace(os.sep, '/')
 
 # Initialize on startup
 initialize_app()
+job_queue = JobQueue()
+result_cache = ResultCache()
+result_store = ResultStore()
+retention = RetentionManager(job_queue, result_cache, result_store)
+retention.start()
+
+def ml_pipeline_version():
+    from your_colab_code.main import pipeline_version
+    return pipeline_version()
+
+def gemini_pipeline_version():
+    from gemini_integration import pipeline_version
+    return pipeline_version()
+
+PIPELINE_VERSIONS = {
+    'ml': ml_pipeline_version,
+    'gemini': gemini_pipeline_version,
+}
+
+def run_ml_job(file_path, pdf_hash, version, job_id=None, progress=None, pages=None, ocr_classes=None):
+    """Run the ML pipeline for a queued job and store its template data
+
+    The result store is the only copy a job keeps, so nothing is returned
+    into the job's state.
+    """
+    from your_colab_code.main import process_pdf
+    
+    image_urls, latex, texts, audio_urls, image_urls_with_details = process_pdf(
+        file_path, job_id=job_id, progress=progress, pages=pages, ocr_classes=ocr_classes)
+    result = {
+        'image_urls': image_urls,
+        'image_urls_with_details': image_urls_with_details,
+        'texts': texts,
+        'audio_urls': audio_urls,
+        'latex': latex,
+    }
+    result_cache.put(pdf_hash, 'ml', version, result)
+    result_store.save(job_id, result)
+
+def run_gemini_job(file_path, pdf_hash, version, job_id=None, progress=None, pages=None):
+    """Run the Gemini pipeline for a queued job and return its template data"""
+    from gemini_integration import process_document_with_gemini
+    
+    analysis_result = process_document_with_gemini(file_path, progress=progress, pages=pages)
+    result = {
+        'page_explanations': analysis_result.get('page_explanations', []),
+        'page_urls': analysis_result.get('page_urls', []),
+        'page_numbers': analysis_result.get('page_numbers', []),
+    }
+    # Failures come back as a single error explanation without pages
+    if result['page_urls']:
+        result_cache.put(pdf_hash, 'gemini', version, result)
+    return result
+
+JOB_RUNNERS = {
+    'ml': run_ml_job,
+    'gemini': run_gemini_job,
+}
+
+def processing_options(kind):
+    """Read the optional 'pages' and (ML only) 'classes' upload parameters
+
+    Raises ValueError with a message for the client on bad input.
+    """
+    options = {}
+    pages = (request.values.get('pages') or '').strip()
+    if pages:
+        options['pages'] = parse_page_ranges(pages)
+    
+    if kind == 'ml':
+        requested = [name.strip() for value in request.values.getlist('classes')
+                     for name in value.split(',') if name.strip()]
+        if requested:
+            try:
+                known = {name.lower(): name for name in yolo_class_names()}
+            except OSError:
+                from your_colab_code.main import OCR_CLASSES
+                known = {name.lower(): name for name in OCR_CLASSES}
+            unknown = [name for name in requested if name.lower() not in known]
+            if unknown:
+                raise ValueError(f"Unknown classes: {', '.join(unknown)}. "
+                                 f"Choose from: {', '.join(known.values())}")
+            options['ocr_classes'] = list(dict.fromkeys(known[name.lower()] for name in requested))
+    return options
+
+def options_version(options):
+    """Suffix for the cache version so results for different options never mix"""
+    suffix = ''
+    if options.get('pages'):
+        suffix += f":pages={format_page_ranges(options['pages'])}"
+    if options.get('ocr_classes'):
+        suffix += f":classes={'+'.join(options['ocr_classes'])}"
+    return suffix
+
+def start_job(kind, file_path, pdf_hash, options=None):
+    """Serve a repeat upload from the result cache, otherwise queue a job"""
+    options = options or {}
+    version = PIPELINE_VERSIONS[kind]() + options_version(options)
+    cached = result_cache.get(pdf_hash, kind, version)
+    if cached is not None:
+        logger.info(f"Serving {kind} result for {pdf_hash[:12]} from cache")
+        os.remove(file_path)
+        if kind == 'ml':
+            job_id = job_queue.add_finished(kind, None, cached=True)
+            result_store.save(job_id, cached)
+        else:
+            job_id = job_queue.add_finished(kind, cached, cached=True)
+        return job_id
+    return job_queue.submit(kind, JOB_RUNNERS[kind], file_path, pdf_hash, version, **options)
+
+def job_accepted(job_id):
+    """Answer an upload with the job id (JSON clients) or the loading page"""
+    session['job_id'] = job_id
+    status = job_queue.get(job_id)['status']
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'job_id': job_id,
+                        'status': status,
+                        'status_url': url_for('job_status', job_id=job_id),
+                        'result_url': url_for('job_result', job_id=job_id)}), 200 if status == DONE else 202
+    # The result page streams pages in while the job is still running
+    return redirect(url_for('job_result', job_id=job_id))
+
+def paginate(endpoint, job_id, *totals_and_sizes):
+    """Clamp ?page= to the pages needed for every (total, per-page) pair; return it and the pager links"""
+    pages = max([1] + [-(-total // size) for total, size in totals_and_sizes])
+    page = min(max(request.args.get('page', 1, type=int), 1), pages)
+    pagination = {
+        'page': page,
+        'pages': pages,
+        'prev_url': url_for(endpoint, job_id=job_id, page=page - 1) if page > 1 else None,
+        'next_url': url_for(endpoint, job_id=job_id, page=page + 1) if page < pages else None,
+    }
+    return page, pagination
+
+def render_ml_result(job_id, endpoint):
+    """Render one page of a finished ML job's annotated pages and segments"""
+    counts = result_store.counts(job_id)
+    if counts is None:
+        return "No results found for this job", 404
+    session['ml_job_id'] = job_id
+    page_count, segment_count = counts
+    page, pagination = paginate(endpoint, job_id, (page_count, RESULT_PAGES_PER_VIEW),
+                                (segment_count, RESULT_SEGMENTS_PER_VIEW))
+    segment_offset = (page - 1) * RESULT_SEGMENTS_PER_VIEW
+    return render_template('result.html',
+                           image_urls=result_store.page_slice(job_id, (page - 1) * RESULT_PAGES_PER_VIEW,
+                                                              RESULT_PAGES_PER_VIEW),
+                           segment_offset=segment_offset,
+                           equations_url=url_for('equations', job_id=job_id),
+                           pagination=pagination,
+                           **result_store.segment_slice(job_id, segment_offset, RESULT_SEGMENTS_PER_VIEW))
 
 @app.route('/')
 def index():
@@ -68,24 +278,43 @@ def upload():
     if not filename.lower().endswith('.pdf'):
         return "Invalid file type. Please upload a PDF file.", 400
     
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    pdf.save(file_path)
+    reason = missing_models_reason()
+    if reason:
+        return reason, 503
     
-    session['ml_file_path'] = file_path
-    session['processing_type'] = 'ml'
+    try:
+        options = processing_options('ml')
+    except ValueError as e:
+        return str(e), 400
     
-    return redirect(url_for('loading')) 
+    # Jobs run in the background, so give each upload its own file
+    file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex[:8]}_{filename}")
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    pdf_hash = save_and_hash(pdf.stream, file_path)
+    try:
+        check_pages_exist(file_path, options.get('pages'))
+    except ValueError as e:
+        os.remove(file_path)
+        return str(e), 400
+    
+    job_id = start_job('ml', file_path, pdf_hash, options)
+    return job_accepted(job_id)
+
 @app.route('/use')  # This route should render 'use.html'
 def use():
     return render_template('use.html')
 @app.route('/equations')  # This route should render 'use.html'
 def equations():
-    return render_template('equations.html',
-                           image_urls_with_details=image1,
-                           texts=extracted_text,
-                           audio_urls=audio_path,
-                           latex=latexs)
+    job_id = request.args.get('job_id') or session.get('ml_job_id')
+    counts = result_store.counts(job_id) if job_id else None
+    if counts is None:
+        return render_template('equations.html', image_urls_with_details=[], texts=[], audio_urls=[], latex=[],
+                               segment_offset=0, pagination=None)
+    
+    page, pagination = paginate('equations', job_id, (counts[1], RESULT_SEGMENTS_PER_VIEW))
+    segment_offset = (page - 1) * RESULT_SEGMENTS_PER_VIEW
+    return render_template('equations.html', segment_offset=segment_offset, pagination=pagination,
+                           **result_store.segment_slice(job_id, segment_offset, RESULT_SEGMENTS_PER_VIEW))
 
 @app.route('/upload-gemini', methods=['POST'])
 def upload_gemini():
@@ -101,89 +330,157 @@ def upload_gemini():
     if not filename.lower().endswith('.pdf'):
         return "Invalid file type. Please upload a PDF file.", 400
     
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    pdf.save(file_path)
+    try:
+        options = processing_options('gemini')
+    except ValueError as e:
+        return str(e), 400
     
-    session['gemini_file_path'] = file_path
-    session['processing_type'] = 'gemini'
+    # Jobs run in the background, so give each upload its own file
+    file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex[:8]}_{filename}")
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    pdf_hash = save_and_hash(pdf.stream, file_path)
+    try:
+        check_pages_exist(file_path, options.get('pages'))
+    except ValueError as e:
+        os.remove(file_path)
+        return str(e), 400
     
-    return redirect(url_for('loading'))
+    job_id = start_job('gemini', file_path, pdf_hash, options)
+    return job_accepted(job_id)
 
 @app.route('/loading')
 def loading():
-    """Show loading page while processing"""
-    processing_type = session.get('processing_type', 'ml')
-    
-    if processing_type == 'gemini':
-        redirect_url = url_for('gemini_results')
-    else:
-        redirect_url = url_for('process_ml_results')
+    """Show loading page that polls the job's real progress"""
+    job_id = request.args.get('job_id') or session.get('job_id')
+    if not job_id or job_queue.get(job_id) is None:
+        return "No job found in session", 400
     
-    return render_template('loading.html', redirect_url=redirect_url)
+    return render_template('loading.html',
+                           status_url=url_for('job_status', job_id=job_id),
+                           redirect_url=url_for('job_result', job_id=job_id))
 
-@app.route('/process-ml-results')
-def process_ml_results():
-    """Process ML model results"""
-    file_path = session.get('ml_file_path')
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report a job's status and per-stage progress"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    job.pop('result', None)
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Render the results of a finished job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return "Job not found", 404
     
-    if not file_path:
-        return "No file found in session", 400
+    if job['status'] == FAILED:
+        if job['error_type'] == 'ValueError':
+            return f"Configuration error: {job['error']}", 500
+        if job['error_type'] == 'FileNotFoundError':
+            return f"Required file not found: {job['error']}", 500
+        return f"Error processing document: {job['error']}", 500
     
-    if not os.path.exists(file_path):
-        session.pop('ml_file_path', None)
-        session.pop('processing_type', None)
-        return "File not found on server", 404
+    if job['status'] != DONE:
+        # Render the page empty and let it fill in from the event stream
+        stream_url = url_for('job_stream', job_id=job_id)
+        if job['kind'] == 'gemini':
+            return render_template('gemini_result.html', page_explanations=[], page_urls=[], page_numbers=[],
+                                   stream_url=stream_url)
+        return render_template('result.html', image_urls=[], image_urls_with_details=[], texts=[],
+                               audio_urls=[], latex=[], segment_offset=0, pagination=None,
+                               equations_url=url_for('equations', job_id=job_id), stream_url=stream_url)
     
+    if job['kind'] == 'gemini':
+        return render_template('gemini_result.html', **job['result'])
+    return render_ml_result(job_id, 'job_result')
+
+@app.route('/jobs/<job_id>/stream')
+def job_stream(job_id):
+    """Server-Sent Events: each page and segment of a job as soon as it is ready"""
+    if job_queue.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
     try:
-        global image_path, latexs, extracted_text, audio_path, image1
-        image_path, latexs, extracted_text, audio_path, image1 = process_pdf(file_path)
-        
-        session.pop('ml_file_path', None)
-        session.pop('processing_type', None)
-        
-        return render_template('result.html',
-                             image_urls=image_path,
-                             image_urls_with_details=image1,
-                             texts=extracted_text,
-                             audio_urls=audio_path,
-                             latex=latexs)
+        # Byte offset into the event log; anything malformed starts over
+        offset = max(0, int(request.headers.get('Last-Event-ID') or request.args.get('offset') or 0))
+    except ValueError:
+        offset = 0
+    result_url = url_for('job_result', job_id=job_id)
     
-    except ValueError as e:
-        return f"Configuration error: {str(e)}", 500
-    except FileNotFoundError as e:
-        return f"Required file not found: {str(e)}", 500
-    except Exception as e:
-        return f"Error processing document: {str(e)}", 500
-
-@app.route('/gemini-results')
-def gemini_results():
-    """Show Gemini AI analysis results"""
-    file_path = session.get('gemini_file_path')
+    def generate(offset):
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        last_progress = None
+        started = last_sent = time.time()
+        while True:
+            # Read the status before the events: a finished job has already
+            # written all of its events
+            job = job_queue.get(job_id)
+            if job is None:
+                # Its state was removed (e.g. by retention) while we streamed
+                yield f"event: done\ndata: {json.dumps({'status': FAILED, 'error': 'Job not found'})}\n\n"
+                return
+            events, offset = job_queue.events(job_id, offset)
+            for event_offset, event in events:
+                yield f"id: {event_offset}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                last_sent = time.time()
+            
+            progress = {'status': job['status'], 'stage': job['stage'], **job['progress']}
+            progress.pop('stages', None)
+            if progress != last_progress:
+                last_progress = progress
+                yield f"event: progress\ndata: {json.dumps(progress)}\n\n"
+                last_sent = time.time()
+            
+            if job['status'] in (DONE, FAILED):
+                done = {'status': job['status'], 'error': job['error'], 'result_url': result_url}
+                yield f"event: done\ndata: {json.dumps(done)}\n\n"
+                return
+            if time.time() - started >= STREAM_MAX_SECONDS:
+                return
+            
+            if time.time() - last_sent >= STREAM_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.time()
+            time.sleep(STREAM_POLL_SECONDS)
     
-    if not file_path:
-        return "No file found in session", 400
+    return Response(generate(offset), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/cache')
+def cache_stats():
+    """Report result and TTS cache hit/miss counters and size"""
+    from your_colab_code.tts_cache import get_tts_cache
     
-    if not os.path.exists(file_path):
-        session.pop('gemini_file_path', None)
-        session.pop('processing_type', None)
-        return "File not found on server", 404
+    return jsonify({'results': result_cache.stats(),
+                    'tts': get_tts_cache().stats()})
+
+@app.route('/models')
+def models_status():
+    """Report model download progress, whether ML uploads can run, and this worker's loaded models"""
+    return jsonify({'ready': models_ready(),
+                    'reason': missing_models_reason(),
+                    'download': download_status(),
+                    'loaded': model_stats(),
+                    'memory': process_memory()})
+
+@app.route('/admin/storage', methods=['GET', 'POST'])
+def storage_usage():
+    """Report disk usage per artifact directory against its quota; POST runs a retention sweep now"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Forbidden'}), 403
     
-    try:
-        analysis_result = process_document_with_gemini(file_path)
-        
-        page_explanations = analysis_result.get('page_explanations', [])
-        page_urls = analysis_result.get('page_urls', [])
-        
-        session.pop('gemini_file_path', None)
-        session.pop('processing_type', None)
-        
-        return render_template('gemini_result.html',
-                             page_explanations=page_explanations,
-                             page_urls=page_urls)
-    
-    except Exception as e:
-        return f"Error processing document: {str(e)}", 500
+    swept = retention.sweep() if request.method == 'POST' else None
+    return jsonify({'directories': retention.usage(),
+                    'last_sweep': swept or retention.last_sweep(),
+                    'sweep_skipped': request.method == 'POST' and swept is None})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus histograms and counters for pipeline stages and jobs"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/about')
 @app.route('/about.html')
@@ -210,12 +507,12 @@ def index_html():
 @app.route('/result')
 def result():
     """Show ML model results (existing functionality)"""
-    return render_template('result.html',
-                           image_urls=image_path,
-                           image_urls_with_details=image1,
-                           texts=extracted_text,
-                           audio_urls=audio_path,
-                           latex=latexs)
+    job_id = request.args.get('job_id') or session.get('ml_job_id')
+    if not job_id:
+        return render_template('result.html', image_urls=[], image_urls_with_details=[], texts=[],
+                               audio_urls=[], latex=[], segment_offset=0, pagination=None,
+                               equations_url=url_for('equations'))
+    return render_ml_result(job_id, 'result')
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5002)
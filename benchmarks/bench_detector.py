@@ -0,0 +1,135 @@
+"""
+Per-page latency of the layout detector on each engine (CPU only).
+
+Pages are rendered at the pipeline's detection DPI from the given PDFs
+(or a synthetic one from benchmarks/data/), then every engine runs
+preprocessing, the forward pass and box decoding over them in batches.
+Engines whose model file or runtime is missing are reported and skipped.
+
+Run from the repository root:
+    python benchmarks/bench_detector.py --pages 50
+    python benchmarks/bench_detector.py --engines darknet onnxruntime onnxruntime-int8 --batch-sizes 1 4
+    python benchmarks/bench_detector.py sample.pdf --input-sizes 320 416 608
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from bench_pipeline import RESULTS_DIR, git_commit, synthetic_pdf
+from your_colab_code.detector_engine import create_engine, DETECTOR_THREADS, YOLO_INPUT_SIZE
+from your_colab_code.model_registry import get_yolo_path
+from your_colab_code.page_source import PdfPageSource
+from your_colab_code.yolo_postprocess import detect_objects
+
+DETECT_DPI = 90
+ENGINES = ('darknet', 'openvino', 'openvino-int8', 'onnxruntime', 'onnxruntime-int8')
+
+
+def render_pages(pdf_paths, limit, seed=0):
+    """BGR pages as the ML pipeline's detect stage sees them."""
+    pdf_paths = pdf_paths or [synthetic_pdf(limit, seed)]
+    pages = []
+    for pdf_path in pdf_paths:
+        for _, pil_image in PdfPageSource(pdf_path, dpi=DETECT_DPI):
+            if len(pages) >= limit:
+                return pages
+            pages.append(cv2.cvtColor(np.asarray(pil_image.convert('RGB')), cv2.COLOR_RGB2BGR))
+    return pages
+
+
+def load_engine(name, input_size):
+    """Build engine `name` ('onnxruntime-int8' etc.) or return (None, reason)."""
+    backend, _, variant = name.partition('-')
+    try:
+        return create_engine(get_yolo_path(), backend=backend, int8=variant == 'int8', input_size=input_size), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def detect(engine, images):
+    """Forward pass plus decoding, one box list per image."""
+    outputs = engine.forward(images)
+    return [detect_objects(page_outputs, image.shape[1], image.shape[0])
+            for image, page_outputs in zip(images, outputs)]
+
+
+def time_engine(engine, pages, batch_size, warmup=2):
+    for _ in range(warmup):
+        detect(engine, pages[:batch_size])
+
+    per_page = []
+    start = time.perf_counter()
+    for i in range(0, len(pages), batch_size):
+        batch = pages[i:i + batch_size]
+        batch_start = time.perf_counter()
+        detect(engine, batch)
+        per_page.extend([(time.perf_counter() - batch_start) / len(batch)] * len(batch))
+    wall = time.perf_counter() - start
+
+    latencies = np.array(per_page) * 1000
+    return {
+        'mean_ms': round(float(latencies.mean()), 2),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        'pages_per_second': round(len(pages) / wall, 2) if wall else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdfs', nargs='*', help='PDFs to render pages from (default: a synthetic PDF)')
+    parser.add_argument('--pages', type=int, default=30)
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--input-sizes', type=int, nargs='+', default=[YOLO_INPUT_SIZE])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='result file (default: benchmarks/results/detector_<timestamp>_<commit>.json)')
+    args = parser.parse_args()
+
+    pages = render_pages(args.pdfs, args.pages, args.seed)
+    print(f"{len(pages)} page(s) at {DETECT_DPI} DPI, {os.cpu_count()} CPU(s), "
+          f"DETECTOR_THREADS={DETECTOR_THREADS or 'default'}, OpenCV {cv2.__version__}")
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'pages': len(pages),
+        'runs': [],
+    }
+    for input_size in args.input_sizes:
+        for name in args.engines:
+            engine, error = load_engine(name, input_size)
+            if engine is None:
+                print(f"{name:>17} {input_size}: skipped ({error})")
+                report['runs'].append({'engine': name, 'input_size': input_size, 'status': 'skipped',
+                                       'error': error})
+                continue
+            for batch_size in args.batch_sizes:
+                run = {'engine': name, 'input_size': engine.input_size, 'batch_size': batch_size, 'status': 'ok'}
+                run.update(time_engine(engine, pages, batch_size))
+                report['runs'].append(run)
+                print(f"{name:>17} {engine.input_size} x{batch_size}: {run['mean_ms']:.1f} ms/page "
+                      f"(p50 {run['p50_ms']:.1f}, p95 {run['p95_ms']:.1f}), {run['pages_per_second']:.2f} pages/s")
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"detector_{datetime.now():%Y%m%d-%H%M%S}_{report['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Saved {out}")
+
+
+if __name__ == '__main__':
+    main()
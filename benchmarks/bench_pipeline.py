@@ -0,0 +1,392 @@
+"""
+End-to-end throughput benchmark for process_pdf and process_document_with_gemini.
+
+Groq, Gemini and gTTS are replaced by deterministic local fakes with a
+configurable latency, so runs need no network or API keys; YOLO, LatexOCR
+and pdftoppm are the real thing. Synthetic PDFs (text, equations, figures
+and tables) are generated once into benchmarks/data/. Every run happens in
+a fresh subprocess so peak RSS is per run.
+
+Run from the repository root:
+    python benchmarks/bench_pipeline.py --pages 1 10 100 500
+    python benchmarks/bench_pipeline.py --pages 10 --pipelines gemini --gemini-latency 2
+    python benchmarks/bench_pipeline.py --pages 10 --baseline benchmarks/results/<older>.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+RESULT_MARKER = 'BENCH_RESULT '
+
+WORDS = ("force mass energy velocity equation solution triangle angle area volume "
+         "number fraction ratio graph function value measure circle square cell "
+         "molecule reaction speed distance time density pressure current").split()
+EQUATIONS = (
+    "E = mc^2", "a^2 + b^2 = c^2", "F = m a", "v = u + a t", "x = (-b + sqrt(b^2 - 4ac)) / 2a",
+    "sin^2 x + cos^2 x = 1", "A = pi r^2", "P V = n R T", "s = u t + 1/2 a t^2", "y = m x + c",
+)
+
+
+# --- Synthetic documents ---------------------------------------------------
+
+def _font(size):
+    from PIL import ImageFont
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def draw_page(page_number, rng, width=850, height=1100):
+    """Draw one textbook-like page: heading, paragraphs, equations, a figure and a table."""
+    from PIL import Image, ImageDraw
+
+    page = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    body = _font(16)
+    margin = 60
+    y = margin
+
+    draw.text((margin, y), f"Chapter {page_number // 10 + 1}.{page_number % 10 + 1}  "
+                           f"{rng.choice(WORDS).title()} and {rng.choice(WORDS)}", fill=0, font=_font(28))
+    y += 60
+
+    blocks = ['text', 'equation', 'text', 'figure', 'text', 'table', 'equation']
+    rng.shuffle(blocks)
+    for block in blocks:
+        if y > height - 200:
+            break
+        if block == 'text':
+            for _ in range(rng.randint(3, 6)):
+                line = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(9, 13)))
+                draw.text((margin, y), line.capitalize() + '.', fill=0, font=body)
+                y += 24
+            y += 16
+        elif block == 'equation':
+            draw.text((width // 2 - 120, y), rng.choice(EQUATIONS), fill=0, font=_font(24))
+            y += 60
+        elif block == 'figure':
+            box_w, box_h = 320, 180
+            left = rng.randint(margin, width - margin - box_w)
+            draw.rectangle((left, y, left + box_w, y + box_h), outline=0, width=2)
+            points = [(left + 10 + i * 30, y + box_h - 20 - rng.randint(0, box_h - 40)) for i in range(11)]
+            draw.line(points, fill=0, width=3)
+            draw.ellipse((left + box_w - 60, y + 15, left + box_w - 20, y + 55), outline=0, width=2)
+            draw.text((left, y + box_h + 6), f"Figure {page_number}.{rng.randint(1, 9)}", fill=0, font=body)
+            y += box_h + 50
+        elif block == 'table':
+            rows, cols, cell_w, cell_h = rng.randint(3, 5), 4, 150, 30
+            for r in range(rows + 1):
+                draw.line((margin, y + r * cell_h, margin + cols * cell_w, y + r * cell_h), fill=0, width=1)
+            for c in range(cols + 1):
+                draw.line((margin + c * cell_w, y, margin + c * cell_w, y + rows * cell_h), fill=0, width=1)
+            for r in range(rows):
+                for c in range(cols):
+                    cell = rng.choice(WORDS) if r == 0 else str(rng.randint(1, 999))
+                    draw.text((margin + c * cell_w + 8, y + r * cell_h + 7), cell, fill=0, font=body)
+            y += rows * cell_h + 40
+
+    draw.text((width // 2, height - 40), str(page_number), fill=0, font=body)
+    return page
+
+
+def synthetic_pdf(pages, seed=0, data_dir=DATA_DIR):
+    """Return the path of a `pages`-page synthetic PDF, generating it on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic_{pages}p_seed{seed}.pdf")
+    if os.path.exists(path):
+        return path
+
+    rng = random.Random(seed)
+    images = [draw_page(n, rng) for n in range(1, pages + 1)]
+    tmp_path = path + '.tmp'
+    images[0].save(tmp_path, 'PDF', resolution=100, save_all=True, append_images=images[1:])
+    os.replace(tmp_path, path)
+    print(f"Generated {path}")
+    return path
+
+
+# --- Fakes for the external services ---------------------------------------
+
+def _reply(content):
+    message = types.SimpleNamespace(content=content)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+class FakeGroq:
+    """Stands in for groq.Groq: answers both the batched JSON and the single-segment prompt."""
+
+    def __init__(self, api_key=None, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, response_format=None, **kwargs):
+        time.sleep(self.latency)
+        self.calls += 1
+        prompt = messages[-1]['content']
+        if response_format:
+            segments = json.loads(prompt.split("Segments:\n", 1)[1])
+            return _reply(json.dumps({'results': [
+                {'id': segment['id'], 'english': f"In words: {segment['text']}"} for segment in segments
+            ]}))
+        text = prompt.split("\n\n", 1)[-1]
+        return _reply(f'"In words: {text}"')
+
+
+class FakeGenerativeModel:
+    """Stands in for genai.GenerativeModel with a deterministic per-page explanation."""
+
+    latency = 0.0
+
+    def __init__(self, model_name=None, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, parts):
+        time.sleep(self.latency)
+        if isinstance(parts, str):
+            return types.SimpleNamespace(text=f"Summary of {len(parts)} characters of text.")
+        prompt, payload = parts
+        digest = hashlib.sha256(payload['data']).hexdigest()[:12]
+        page = prompt.rsplit('page ', 1)[-1].split(' ', 1)[0]
+        return types.SimpleNamespace(text=f"## Page {page}\nThis page ({digest}, "
+                                          f"{len(payload['data'])} bytes) explains a textbook topic.")
+
+
+class FakeGTTS:
+    """Stands in for gtts.gTTS: writes a small deterministic file instead of calling Google."""
+
+    latency = 0.0
+
+    def __init__(self, text, lang='en', tld='com', **kwargs):
+        self.text = text
+
+    def save(self, path):
+        time.sleep(self.latency)
+        with open(path, 'wb') as f:
+            f.write(b'ID3' + hashlib.sha256(self.text.encode('utf-8')).digest() * 16)
+
+
+# --- One run, in its own process -------------------------------------------
+
+class ProgressRecorder:
+    """Collects progress callbacks with the time each counter last changed."""
+
+    def __init__(self):
+        self.start = time.time()
+        self.counters = {}
+        self.changed_at = {}
+        self.stages = {}
+        self.first_event = None
+
+    def __call__(self, stage=None, **counters):
+        now = time.time() - self.start
+        if counters.pop('event', None) is not None and self.first_event is None:
+            self.first_event = now
+        stages = counters.pop('stages', None)
+        if stages:
+            self.stages = stages
+        for key, value in counters.items():
+            if self.counters.get(key) != value:
+                self.counters[key] = value
+                self.changed_at[key] = now
+
+
+def peak_rss_mb():
+    import resource
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / (1024 * 1024), 1)
+
+
+def run_one(args):
+    """Benchmark one (pipeline, pdf) pair and print a marked JSON line for the parent."""
+    scratch = tempfile.mkdtemp(prefix='bench-')
+    os.environ.update({
+        'GROQ_API_KEY': 'bench', 'GEMINI_API_KEY': 'bench',
+        'TTS_BACKEND': 'gtts', 'TTS_CACHE_DIR': os.path.join(scratch, 'tts_cache'),
+        'GEMINI_REQUESTS_PER_MINUTE': str(args.gemini_rpm),
+    })
+    gtts_module = types.ModuleType('gtts')
+    gtts_module.gTTS = FakeGTTS
+    sys.modules['gtts'] = gtts_module
+    FakeGTTS.latency = args.tts_latency
+    FakeGenerativeModel.latency = args.gemini_latency
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+    pdf_path = os.path.abspath(args.run_one[1])
+    pages = int(args.run_one[2])
+    result = {'pipeline': args.run_one[0], 'pages': pages, 'pdf': os.path.relpath(pdf_path, ROOT)}
+    recorder = None
+    try:
+        if args.run_one[0] == 'ml':
+            import your_colab_code.main as ml
+            from your_colab_code.model_registry import warm_up
+
+            ml.Groq = lambda api_key=None: FakeGroq(api_key, latency=args.groq_latency)
+            load_start = time.time()
+            warm_up()
+            result['model_load_seconds'] = round(time.time() - load_start, 3)
+            result['rss_after_load_mb'] = peak_rss_mb()
+
+            job_id = f"bench{os.getpid()}"
+            recorder = ProgressRecorder()
+            outputs = ml.process_pdf(pdf_path, job_id=job_id, progress=recorder)
+            wall = time.time() - recorder.start
+            shutil.rmtree(os.path.join('static', 'jobs', job_id), ignore_errors=True)
+
+            crops = recorder.counters.get('crops_detected', 0)
+            result.update({
+                'segments_voiced': sum(1 for path in outputs[3] if path != "ERROR in Prediction"),
+                'segments_total': len(outputs[3]),
+                'crops': crops,
+                'crops_per_second': round(crops / wall, 3) if wall else 0.0,
+                'stages': {name: {key: stats[key] for key in ('wall_seconds', 'busy_seconds', 'processed',
+                                                              'items_per_second', 'workers', 'executor')}
+                           for name, stats in recorder.stages.items()},
+            })
+        else:
+            import gemini_integration
+
+            gemini_integration.genai.configure = lambda **kwargs: None
+            gemini_integration.genai.GenerativeModel = FakeGenerativeModel
+
+            recorder = ProgressRecorder()
+            outputs = gemini_integration.process_document_with_gemini(pdf_path, progress=recorder)
+            wall = time.time() - recorder.start
+            if not outputs.get('page_urls'):
+                # process_pdf_with_gemini reports failures as an explanation
+                raise RuntimeError(outputs['page_explanations'][0])
+            for url in outputs['page_urls']:
+                if os.path.exists(url):
+                    os.remove(url)
+
+            result.update({
+                'pages_explained': len(outputs.get('page_explanations', [])),
+                'payload_bytes': recorder.counters.get('payload_bytes', 0),
+                'stages': {
+                    'render_encode': {'wall_seconds': round(recorder.changed_at.get('pages_rendered', 0.0), 3)},
+                    'explain': {'wall_seconds': round(recorder.changed_at.get('pages_explained', 0.0), 3)},
+                },
+            })
+        result.update({
+            'status': 'ok',
+            'first_content_seconds': round(recorder.first_event, 3) if recorder.first_event is not None else None,
+            'wall_seconds': round(wall, 3),
+            'pages_per_second': round(pages / wall, 3) if wall else 0.0,
+        })
+    except Exception as e:
+        result.update({'status': 'failed', 'error': f"{type(e).__name__}: {e}"})
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(RESULT_MARKER + json.dumps(result))
+
+
+# --- Driver ----------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def spawn_run(args, pipeline, pdf_path, pages):
+    command = [sys.executable, os.path.abspath(__file__), '--run-one', pipeline, pdf_path, str(pages),
+               '--groq-latency', str(args.groq_latency), '--gemini-latency', str(args.gemini_latency),
+               '--tts-latency', str(args.tts_latency), '--gemini-rpm', str(args.gemini_rpm)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    return {'pipeline': pipeline, 'pages': pages, 'status': 'failed',
+            'error': (completed.stderr or completed.stdout).strip().splitlines()[-1:]}
+
+
+def print_comparison(report, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(run['pipeline'], run['pages']): run for run in baseline.get('runs', [])}
+    print(f"\nAgainst {baseline_path} (commit {baseline.get('commit')}):")
+    for run in report['runs']:
+        old = previous.get((run['pipeline'], run['pages']))
+        if not old or run.get('status') != 'ok' or old.get('status') != 'ok':
+            continue
+        speedup = run['pages_per_second'] / old['pages_per_second'] if old['pages_per_second'] else 0.0
+        print(f"  {run['pipeline']:>6} {run['pages']:>4}p: {old['pages_per_second']:.3f} -> "
+              f"{run['pages_per_second']:.3f} pages/s ({speedup:.2f}x), "
+              f"peak RSS {old['peak_rss_mb']} -> {run['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100, 500])
+    parser.add_argument('--pipelines', nargs='+', choices=('ml', 'gemini'), default=['ml', 'gemini'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--groq-latency', type=float, default=0.5, help='seconds per fake Groq completion')
+    parser.add_argument('--gemini-latency', type=float, default=1.5, help='seconds per fake Gemini call')
+    parser.add_argument('--tts-latency', type=float, default=0.3, help='seconds per fake gTTS clip')
+    parser.add_argument('--gemini-rpm', type=int, default=100000,
+                        help='Gemini requests per minute; high by default to measure the pipeline, not the quota')
+    parser.add_argument('--out', help='result file (default: benchmarks/results/<timestamp>_<commit>.json)')
+    parser.add_argument('--baseline', help='earlier result file to compare pages/sec and RSS against')
+    parser.add_argument('--run-one', nargs=3, metavar=('PIPELINE', 'PDF', 'PAGES'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(args)
+        return
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'settings': {
+            'groq_latency': args.groq_latency, 'gemini_latency': args.gemini_latency,
+            'tts_latency': args.tts_latency, 'gemini_rpm': args.gemini_rpm, 'seed': args.seed,
+        },
+        'runs': [],
+    }
+    for pages in args.pages:
+        pdf_path = synthetic_pdf(pages, args.seed)
+        for pipeline in args.pipelines:
+            run = spawn_run(args, pipeline, pdf_path, pages)
+            report['runs'].append(run)
+            if run.get('status') == 'ok':
+                print(f"{pipeline:>6} {pages:>4}p: {run['wall_seconds']:.2f}s, {run['pages_per_second']:.3f} pages/s, "
+                      f"{run.get('crops_per_second', 0.0):.2f} crops/s, peak RSS {run['peak_rss_mb']} MB")
+            else:
+                print(f"{pipeline:>6} {pages:>4}p: failed ({run.get('error')})")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}_{report['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Saved {out}")
+
+    if args.baseline:
+        print_comparison(report, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Micro-benchmark: vectorized YOLO output decoding vs the original per-row loop.
+
+Run from the repository root:
+    python benchmarks/bench_yolo_decode.py --pages 50
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from your_colab_code.yolo_postprocess import decode_yolo_outputs, detect_objects
+
+# YOLOv3 at 416x416: three heads of 13x13, 26x26 and 52x52 cells, 3 anchors each
+LAYER_ROWS = (13 * 13 * 3, 26 * 26 * 3, 52 * 52 * 3)
+NUM_CLASSES = 7
+
+
+def make_layer_outputs(rng, positive_rate=0.002):
+    """Build random layer outputs with a sprinkling of confident detections."""
+    outputs = []
+    for rows in LAYER_ROWS:
+        output = rng.random_sample((rows, 5 + NUM_CLASSES)).astype(np.float32)
+        output[:, 2:4] *= 0.3
+        output[:, 5:] *= 0.1
+        hits = rng.random_sample(rows) < positive_rate
+        output[hits, 5 + rng.randint(0, NUM_CLASSES, hits.sum())] = rng.uniform(0.5, 1.0, hits.sum())
+        outputs.append(output)
+    return outputs
+
+
+def loop_decode(layer_outputs, width, height, conf_threshold=0.05):
+    """The per-row decoding loop previously used in process_pdf; the tests' parity reference too."""
+    boxes = []
+    confidences = []
+    class_ids = []
+    for output in layer_outputs:
+        for detection in output:
+            scores = detection[5:]
+            class_id = np.argmax(scores)
+            confidence = scores[class_id]
+            if confidence > conf_threshold:
+                box = detection[0:4] * np.array([width, height, width, height])
+                center_x, center_y, box_width, box_height = box.astype("int")
+                x = int(center_x - (box_width / 2))
+                y = int(center_y - (box_height / 2))
+                boxes.append([x, y, int(box_width), int(box_height)])
+                confidences.append(float(confidence))
+                class_ids.append(int(class_id))
+    return boxes, confidences, class_ids
+
+
+def loop_detect(layer_outputs, width, height):
+    boxes, confidences, class_ids = loop_decode(layer_outputs, width, height)
+    if not boxes:
+        return []
+    indices = cv2.dnn.NMSBoxes(boxes, confidences, score_threshold=0.5, nms_threshold=0.3)
+    return [tuple(boxes[i]) + (confidences[i], class_ids[i]) for i in np.asarray(indices).flatten()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--width', type=int, default=765)
+    parser.add_argument('--height', type=int, default=990)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    pages = [make_layer_outputs(rng) for _ in range(args.pages)]
+
+    start = time.perf_counter()
+    loop_results = [loop_detect(outputs, args.width, args.height) for outputs in pages]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vector_results = [detect_objects(outputs, args.width, args.height) for outputs in pages]
+    vector_seconds = time.perf_counter() - start
+
+    # The decoders must agree on every candidate above the NMS score threshold
+    mismatched = 0
+    for outputs in pages:
+        boxes, confidences, class_ids = loop_decode(outputs, args.width, args.height)
+        expected = sorted((tuple(b), c) for b, s, c in zip(boxes, confidences, class_ids) if s > 0.5)
+        v_boxes, _, v_class_ids = decode_yolo_outputs(outputs, args.width, args.height)
+        actual = sorted((tuple(int(v) for v in b), int(c)) for b, c in zip(v_boxes, v_class_ids))
+        mismatched += expected != actual
+
+    print(f"Pages:               {args.pages}")
+    print(f"Loop decode + NMS:   {loop_seconds / args.pages * 1000:.3f} ms/page")
+    print(f"Vectorized + NMS:    {vector_seconds / args.pages * 1000:.3f} ms/page")
+    print(f"Speedup:             {loop_seconds / max(vector_seconds, 1e-9):.1f}x")
+    print(f"Detections (loop / vectorized): {sum(map(len, loop_results))} / {sum(map(len, vector_results))}")
+    print(f"Pages with differing candidates: {mismatched}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Parity check: an accelerated detector engine against the Darknet reference.
+
+Both engines detect on the same pages; boxes are matched per class by IoU.
+Agreement is the F1 of matched boxes over the reference and candidate
+detections. Exits with status 1 when agreement falls below --min-agreement,
+so the check can gate switching DETECTOR_BACKEND or enabling DETECTOR_INT8.
+
+Run from the repository root:
+    python benchmarks/detector_parity.py --engine onnxruntime
+    python benchmarks/detector_parity.py sample.pdf --engine onnxruntime-int8 --min-agreement 0.9
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from bench_detector import ENGINES, detect, load_engine, render_pages
+from your_colab_code.detector_engine import YOLO_INPUT_SIZE
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    overlap_w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    overlap_h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    overlap = overlap_w * overlap_h
+    union = aw * ah + bw * bh - overlap
+    return overlap / union if union > 0 else 0.0
+
+
+def match_page(reference, candidate, threshold):
+    """Greedily pair boxes of the same class, best IoU first.
+
+    Returns (matched IoUs, class mismatches): a class mismatch is a
+    candidate box overlapping an unmatched reference box of another class.
+    """
+    pairs = sorted(((iou(r[:4], c[:4]), i, j) for i, r in enumerate(reference) for j, c in enumerate(candidate)
+                    if r[5] == c[5]), reverse=True)
+    used_reference, used_candidate, matched = set(), set(), []
+    for overlap, i, j in pairs:
+        if overlap < threshold:
+            break
+        if i in used_reference or j in used_candidate:
+            continue
+        used_reference.add(i)
+        used_candidate.add(j)
+        matched.append(overlap)
+
+    mismatched = 0
+    for j, c in enumerate(candidate):
+        if j in used_candidate:
+            continue
+        if any(i not in used_reference and r[5] != c[5] and iou(r[:4], c[:4]) >= threshold
+               for i, r in enumerate(reference)):
+            mismatched += 1
+    return matched, mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdfs', nargs='*', help='PDFs to render pages from (default: a synthetic PDF)')
+    parser.add_argument('--engine', choices=[e for e in ENGINES if e != 'darknet'], default='onnxruntime')
+    parser.add_argument('--input-size', type=int, default=YOLO_INPUT_SIZE)
+    parser.add_argument('--pages', type=int, default=30)
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU at which two boxes count as the same')
+    parser.add_argument('--min-agreement', type=float, default=0.95)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    engines = {}
+    for name in ('darknet', args.engine):
+        engines[name], error = load_engine(name, args.input_size)
+        if engines[name] is None:
+            sys.exit(f"Cannot load {name}: {error}")
+
+    pages = render_pages(args.pdfs, args.pages, args.seed)
+    reference_total = candidate_total = mismatched_total = 0
+    matched_ious = []
+    worst = []
+    for page_number, image in enumerate(pages, start=1):
+        reference = detect(engines['darknet'], [image])[0]
+        candidate = detect(engines[args.engine], [image])[0]
+        matched, mismatched = match_page(reference, candidate, args.iou)
+        reference_total += len(reference)
+        candidate_total += len(candidate)
+        mismatched_total += mismatched
+        matched_ious.extend(matched)
+        if len(matched) < max(len(reference), len(candidate)):
+            worst.append((page_number, len(reference), len(candidate), len(matched)))
+
+    total = reference_total + candidate_total
+    agreement = 2 * len(matched_ious) / total if total else 1.0
+    print(f"Pages:                 {len(pages)}")
+    print(f"Boxes (darknet / {args.engine}): {reference_total} / {candidate_total}")
+    print(f"Matched at IoU>={args.iou}:  {len(matched_ious)} (mean IoU {np.mean(matched_ious) if matched_ious else 0:.3f})")
+    print(f"Class disagreements:   {mismatched_total}")
+    print(f"Agreement (F1):        {agreement:.3f} (minimum {args.min_agreement})")
+    for page_number, reference_count, candidate_count, matched_count in worst[:10]:
+        print(f"  page {page_number}: {reference_count} reference, {candidate_count} candidate, "
+              f"{matched_count} matched")
+
+    if agreement < args.min_agreement:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
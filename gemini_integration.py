@@ -2,26 +2,67 @@ import os
 import io
 import base64
 import google.generativeai as genai
-from pdf2image import convert_from_path
+from your_colab_code.page_source import PdfPageSource
 from PIL import Image
 import json
 import re
+import hashlib
+import time
+import threading
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from rate_limit import TokenBucket, call_with_retries
+from tracing import span, record_span
 
-class GeminiProcessor:
-    def __init__(self):
-        # Initialize Gemini API
-        # You'll need to set your Gemini API key here
-        # Get your API key from: https://makersuite.google.com/app/apikey
-        self.api_key = os.getenv('GEMINI_API_KEY')
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is not set")
-        genai.configure(api_key=self.api_key)
-        
-        # Initialize the model
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+PIPELINE_VERSION = 'gemini-1'
+GEMINI_MODEL = 'gemini-2.5-flash'
+
+# Pages explained in parallel, and the API quota they share
+GEMINI_CONCURRENCY = int(os.getenv('GEMINI_CONCURRENCY', '4'))
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '60'))
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', '4'))
+
+# How each page is encoded, once, for both the preview and the API payload
+GEMINI_IMAGE_FORMAT = os.getenv('GEMINI_IMAGE_FORMAT', 'JPEG')
+GEMINI_IMAGE_QUALITY = int(os.getenv('GEMINI_IMAGE_QUALITY', '85'))
+GEMINI_IMAGE_MAX_EDGE = int(os.getenv('GEMINI_IMAGE_MAX_EDGE', '1600'))
+
+class PagePayloadProfile:
+    """Encoding settings shared by the page preview and the Gemini request"""
+    
+    EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp', 'PNG': 'png'}
+    
+    def __init__(self, image_format=None, quality=None, max_edge=None):
+        self.image_format = (image_format or GEMINI_IMAGE_FORMAT).upper()
+        if self.image_format not in self.EXTENSIONS:
+            raise ValueError(f"Unsupported page image format: {self.image_format}")
+        self.quality = quality or GEMINI_IMAGE_QUALITY
+        self.max_edge = GEMINI_IMAGE_MAX_EDGE if max_edge is None else max_edge
+    
+    @property
+    def extension(self):
+        return self.EXTENSIONS[self.image_format]
+    
+    @property
+    def mime_type(self):
+        return f"image/{'jpeg' if self.image_format == 'JPEG' else self.image_format.lower()}"
+    
+    def encode(self, image):
+        """Return the page encoded as bytes, downscaled to max_edge if needed"""
+        if self.max_edge and max(image.size) > self.max_edge:
+            image.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+        if self.image_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
         
-        # Define the analysis prompt
-        self.analysis_prompt = """
+        buffer = io.BytesIO()
+        if self.image_format == 'PNG':
+            image.save(buffer, format='PNG', optimize=False)
+        else:
+            image.save(buffer, format=self.image_format, quality=self.quality)
+        return buffer.getvalue()
+
+ANALYSIS_PROMPT = """
                     You are an expert document analyst and accessibility writer.  
         I am giving you a full 5th-grade school textbook in PDF format that contains text, pictures, graphs, tables, and diagrams.  
 
@@ -46,51 +87,134 @@ class GeminiProcessor:
 
 
         """
+
+def pipeline_version():
+    """Version string for cached results: pipeline code, model and prompt."""
+    prompt_hash = hashlib.sha256(ANALYSIS_PROMPT.encode('utf-8')).hexdigest()[:12]
+    return f"{PIPELINE_VERSION}:{GEMINI_MODEL}:{prompt_hash}"
+
+class GeminiProcessor:
+    def __init__(self, model=None, concurrency=None, requests_per_minute=None, max_retries=None,
+                 payload_profile=None):
+        # Any object with generate_content() can stand in for the Gemini
+        # model, e.g. a local fake in benchmarks
+        if model is None:
+            # Initialize Gemini API
+            # You'll need to set your Gemini API key here
+            # Get your API key from: https://makersuite.google.com/app/apikey
+            self.api_key = os.getenv('GEMINI_API_KEY')
+            if not self.api_key:
+                raise ValueError("GEMINI_API_KEY environment variable is not set")
+            genai.configure(api_key=self.api_key)
+            
+            # Initialize the model
+            model = genai.GenerativeModel(GEMINI_MODEL)
+        self.model = model
+        
+        self.concurrency = max(1, concurrency or GEMINI_CONCURRENCY)
+        requests_per_minute = requests_per_minute or GEMINI_REQUESTS_PER_MINUTE
+        self.rate_limiter = TokenBucket(requests_per_minute / 60.0, capacity=self.concurrency)
+        self.max_retries = GEMINI_MAX_RETRIES if max_retries is None else max_retries
+        self.payload_profile = payload_profile or PagePayloadProfile()
+        
+        # Define the analysis prompt
+        self.analysis_prompt = ANALYSIS_PROMPT
+    
+    def _explain_page(self, i, img_bytes):
+        """
+        Ask Gemini to explain one encoded page, retrying rate limits and server errors
+        """
+        prompt = f"{self.analysis_prompt}\n\nThis is page {i+1} of the document."
+        payload = {'mime_type': self.payload_profile.mime_type, 'data': img_bytes}
+        
+        with span('gemini_call', page=i + 1, payload_bytes=len(img_bytes)):
+            response = call_with_retries(
+                lambda: self.model.generate_content([prompt, payload]),
+                bucket=self.rate_limiter,
+                max_retries=self.max_retries,
+            )
+        return response.text
     
-    def process_pdf_with_gemini(self, pdf_path):
+    def process_pdf_with_gemini(self, pdf_path, progress=None, pages=None):
         """
         Process a PDF file using Gemini AI
+
+        progress(stage=None, **counters) is called after every page if given.
+        pages (1-based page numbers) limits which pages are rendered and sent.
         """
         try:
             if not os.path.exists(pdf_path):
                 raise FileNotFoundError(f"PDF file not found: {pdf_path}")
             
-            images = convert_from_path(pdf_path, dpi=150)
+            source = PdfPageSource(pdf_path, dpi=150, pages=pages)
+            if progress:
+                progress('explain', pages_total=len(source), pages_rendered=0, pages_explained=0)
             
             page_urls = []
+            page_numbers = []
             page_images_dir = os.path.join('static', 'page_images')
             os.makedirs(page_images_dir, exist_ok=True)
             
             pdf_basename = os.path.basename(pdf_path).replace('.pdf', '')
             
-            for i, image in enumerate(images):
-                page_filename = f"page_{i+1}_{pdf_basename}.png"
-                page_path = os.path.join(page_images_dir, page_filename)
-                image.save(page_path, 'PNG')
-                page_urls.append(f"static/page_images/{page_filename}")
+            # Pages are explained concurrently; at most two encoded pages
+            # per worker are held in memory waiting for their API call.
+            in_flight = threading.BoundedSemaphore(self.concurrency * 2)
+            progress_lock = threading.Lock()
+            explained = [0]
             
-            results = []
-            for i, image in enumerate(images):
-                print(f"Processing page {i+1} of {len(images)}...")
-                
-                img_byte_arr = io.BytesIO()
-                image.save(img_byte_arr, format='PNG')
-                img_bytes = img_byte_arr.getvalue()
-                
-                prompt = f"{self.analysis_prompt}\n\nThis is page {i+1} of the document."
-                
-                response = self.model.generate_content([prompt, Image.open(io.BytesIO(img_bytes))])
-                
-                results.append({
-                    'page': i+1,
-                    'content': response.text
-                })
+            def page_done(i, page_url, future):
+                in_flight.release()
+                with progress_lock:
+                    explained[0] += 1
+                    if progress:
+                        progress(pages_explained=explained[0])
+                        # Stream the page to the result page as soon as it is explained
+                        if not future.cancelled() and future.exception() is None:
+                            progress(event={'type': 'page', 'page': i + 1, 'image_url': page_url,
+                                            'explanation': future.result()})
             
-            page_explanations = [result['content'] for result in results]
+            futures = []
+            payload_bytes = 0
+            executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='gemini-page')
+            try:
+                render_start = time.perf_counter()
+                for i, image in source:
+                    print(f"Processing page {i+1} ({len(page_urls) + 1} of {len(source)})...")
+                    
+                    # Encode once; the same bytes are the preview and the payload
+                    start_time = time.time()
+                    img_bytes = self.payload_profile.encode(image)
+                    encode_time = time.time() - start_time
+                    record_span('render', time.perf_counter() - render_start, page=i + 1)
+                    print(f"Page {i+1} payload: {len(img_bytes) / 1024:.1f} KB "
+                          f"{self.payload_profile.image_format}, encoded in {encode_time:.3f}s")
+                    
+                    page_filename = f"page_{i+1}_{pdf_basename}.{self.payload_profile.extension}"
+                    page_path = os.path.join(page_images_dir, page_filename)
+                    with open(page_path, 'wb') as f:
+                        f.write(img_bytes)
+                    page_urls.append(f"static/page_images/{page_filename}")
+                    page_numbers.append(i + 1)
+                    payload_bytes += len(img_bytes)
+                    if progress:
+                        progress(pages_rendered=len(page_urls), payload_bytes=payload_bytes)
+                    
+                    in_flight.acquire()
+                    future = executor.submit(contextvars.copy_context().run, self._explain_page, i, img_bytes)
+                    future.add_done_callback(functools.partial(page_done, i, page_urls[-1]))
+                    futures.append(future)
+                    render_start = time.perf_counter()
+                
+                # Collect in submission order so explanations line up with pages
+                page_explanations = [future.result() for future in futures]
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
             
             return {
                 'page_explanations': page_explanations,
-                'page_urls': page_urls
+                'page_urls': page_urls,
+                'page_numbers': page_numbers
             }
             
         except FileNotFoundError as e:
@@ -186,12 +310,12 @@ class GeminiProcessor:
             return self._get_error_response(str(e))
 
 # Example usage function
-def process_document_with_gemini(pdf_path):
+def process_document_with_gemini(pdf_path, progress=None, pages=None):
     """
     Main function to process a document with Gemini AI
     """
     processor = GeminiProcessor()
-    return processor.process_pdf_with_gemini(pdf_path)
+    return processor.process_pdf_with_gemini(pdf_path, progress=progress, pages=pages)
 
 # Test function (you can modify the prompt here)
 def test_gemini_analysis():
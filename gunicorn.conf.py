@@ -0,0 +1,34 @@
+"""Gunicorn settings and boot reporting, shared by the Procfile and Dockerfile.
+
+With GUNICORN_PRELOAD=1 (the default) app.py is imported once in the
+master, so the models loaded by WARM_UP_MODELS are read from disk once and
+every forked worker shares those pages copy-on-write.
+"""
+import gc
+import os
+import time
+
+from your_colab_code.model_registry import process_memory
+
+_server_started = time.time()
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+
+def when_ready(server):
+    memory = process_memory()
+    server.log.info(f"Master ready {time.time() - _server_started:.2f}s after start "
+                    f"(preload_app={preload_app}, RSS {memory['rss_mb']} MB)")
+
+
+def pre_fork(server, worker):
+    # The cyclic GC writes to every tracked object it visits, which would
+    # copy the master's pages into each worker; leave the preloaded ones alone
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    memory = process_memory()
+    worker.log.info(f"Worker {worker.pid} ready {time.time() - _server_started:.2f}s after start: "
+                    f"RSS {memory['rss_mb']} MB, PSS {memory.get('pss_mb', '?')} MB, "
+                    f"private {memory.get('private_mb', '?')} MB, shared {memory.get('shared_mb', '?')} MB")
@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+JOB_STATE_DIR = os.getenv('JOB_STATE_DIR', 'job_state')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# The process running a job rewrites its state file this often; a queued or
+# running job whose file is older than JOB_STALE_SECONDS lost its worker
+JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', '30'))
+JOB_STALE_SECONDS = float(os.getenv('JOB_STALE_SECONDS', '180'))
+# State and event logs of jobs finished longer ago than this are deleted by prune()
+JOB_STATE_MAX_AGE_HOURS = float(os.getenv('JOB_STATE_MAX_AGE_HOURS', '72'))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# error_type of a job whose worker was restarted or killed while it ran
+WORKER_LOST = 'WorkerLost'
+
+
+class Job:
+    """State of one background processing job."""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.stage = QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.error_type = None
+        self.owner_pid = os.getpid()
+        self.created_at = time.time()
+        self.heartbeat_at = self.created_at
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': dict(self.progress),
+            'result': self.result,
+            'error': self.error,
+            'error_type': self.error_type,
+            'owner_pid': self.owner_pid,
+            'created_at': self.created_at,
+            'heartbeat_at': self.heartbeat_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobQueue:
+    """Run document jobs on a pool of background threads.
+
+    Job state is mirrored to a small JSON file per job so that every
+    gunicorn worker can answer status polls, not just the one that accepted
+    the upload. The owning process refreshes the file of each unfinished
+    job every `heartbeat_seconds`; a queued or running job whose heartbeat
+    is older than `stale_seconds` is reported as failed, since the worker
+    that held it was restarted or killed.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, state_dir=JOB_STATE_DIR,
+                 heartbeat_seconds=JOB_HEARTBEAT_SECONDS, stale_seconds=JOB_STALE_SECONDS):
+        self.state_dir = state_dir
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        os.makedirs(state_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-worker')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # Orders state file writes, so a heartbeat cannot overwrite a newer state
+        self._write_lock = threading.Lock()
+        self._heartbeat_pid = None
+
+    def submit(self, kind, func, *args, **kwargs):
+        """Queue `func(*args, job_id=..., progress=..., **kwargs)` and return the job id.
+
+        `func` must return a JSON-serializable result, kept in the job's
+        state (None when it stores its result elsewhere). It can report
+        progress by calling progress(stage=None, **counters), and publish a
+        partial result as soon as it is ready with progress(event={...});
+        events are readable through events() while the job runs.
+        """
+        job = Job(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._save(job)
+        self._start_heartbeat()
+        self._executor.submit(self._run, job, func, args, kwargs)
+        logger.info(f"Queued {kind} job {job.id}")
+        return job.id
+
+    def add_finished(self, kind, result, **progress):
+        """Record a job whose result is already known (e.g. served from cache)."""
+        job = Job(kind)
+        job.status = DONE
+        job.stage = DONE
+        job.progress.update(progress)
+        job.result = result
+        job.started_at = job.finished_at = job.created_at
+        self._save(job)
+        tracing.JOBS.inc(kind=kind, status='cached')
+        return job.id
+
+    def get(self, job_id):
+        """Return the job's state as a dict, or None if the job is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.to_dict()
+        job = self._load(job_id)
+        if job is not None and self._is_stale(job, time.time()):
+            job = self._mark_lost(job)
+        return job
+
+    def live_jobs(self):
+        """Queued and running jobs of every worker, from the shared state directory.
+
+        Only files written within `stale_seconds` are read: the heartbeat
+        keeps every live job's file newer than that.
+        """
+        now = time.time()
+        live = []
+        with os.scandir(self.state_dir) as it:
+            for entry in it:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    if now - entry.stat().st_mtime > self.stale_seconds:
+                        continue
+                except OSError:
+                    continue
+                job = self._load(entry.name[:-len('.json')])
+                if job is None or job['status'] not in (QUEUED, RUNNING) or self._is_stale(job, now):
+                    continue
+                live.append(job)
+        return live
+
+    def prune(self, max_age_hours=JOB_STATE_MAX_AGE_HOURS):
+        """Delete the state and event log of jobs finished more than `max_age_hours` ago.
+
+        Also removes event logs without a state file and temporary files
+        left by a crashed writer. Returns the number of files deleted.
+        """
+        if max_age_hours <= 0:
+            return 0
+        now = time.time()
+        max_age_seconds = max_age_hours * 3600
+        deleted = 0
+        with os.scandir(self.state_dir) as it:
+            entries = [entry for entry in it if entry.is_file()]
+        names = {entry.name for entry in entries}
+        for entry in entries:
+            try:
+                modified = entry.stat().st_mtime
+            except OSError:
+                continue
+            if now - modified <= max_age_seconds:
+                continue
+            if entry.name.endswith('.events.jsonl'):
+                expired = f"{entry.name[:-len('.events.jsonl')]}.json" not in names
+            elif entry.name.endswith('.json'):
+                job = self._load(entry.name[:-len('.json')])
+                expired = job is None or job['status'] not in (QUEUED, RUNNING) or self._is_stale(job, now)
+                if expired and job is not None:
+                    deleted += self._remove(self._events_path(job['id']))
+            else:
+                expired = entry.name.endswith('.tmp')
+            if expired:
+                deleted += self._remove(entry.path)
+        if deleted:
+            logger.info(f"Pruned {deleted} job state file(s) older than {max_age_hours:g} hours")
+        return deleted
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            logger.warning(f"Could not delete {path}: {e}")
+            return 0
+
+    def _is_stale(self, job, now):
+        if job['status'] not in (QUEUED, RUNNING):
+            return False
+        heartbeat = job.get('heartbeat_at') or job.get('started_at') or job['created_at']
+        return now - heartbeat > self.stale_seconds
+
+    def _mark_lost(self, job):
+        """Record that the worker running `job` went away without finishing it."""
+        logger.warning(f"Job {job['id']} has had no heartbeat from pid {job.get('owner_pid')} "
+                       f"for {self.stale_seconds:.0f}s; marking it failed")
+        job = dict(job, status=FAILED, error='The worker running this job stopped before it finished. '
+                                              'Please upload the document again.',
+                   error_type=WORKER_LOST, finished_at=time.time())
+        self._write_state(job)
+        tracing.JOBS.inc(kind=job['kind'], status='lost')
+        return job
+
+    def _start_heartbeat(self):
+        # Started by the process that runs jobs: threads started in the
+        # gunicorn master do not survive the fork into workers
+        with self._lock:
+            if self._heartbeat_pid == os.getpid():
+                return
+            self._heartbeat_pid = os.getpid()
+        threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True).start()
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            with self._lock:
+                unfinished = [job for job in self._jobs.values() if job.status in (QUEUED, RUNNING)]
+            for job in unfinished:
+                try:
+                    self._save(job)
+                except OSError as e:
+                    logger.warning(f"Could not refresh the state of job {job.id}: {e}")
+
+    def _run(self, job, func, args, kwargs):
+        job.status = RUNNING
+        job.started_at = time.time()
+        self._save(job)
+
+        def progress(stage=None, event=None, **counters):
+            if event is not None:
+                self._append_event(job.id, event)
+                if stage is None and not counters:
+                    return
+            with self._lock:
+                if stage:
+                    job.stage = stage
+                job.progress.update(counters)
+            self._save(job)
+
+        try:
+            with tracing.job_context(job.id):
+                job.result = func(*args, job_id=job.id, progress=progress, **kwargs)
+            job.status = DONE
+            job.stage = DONE
+        except Exception as e:
+            logger.exception(f"Job {job.id} failed")
+            job.status = FAILED
+            job.error = str(e)
+            job.error_type = type(e).__name__
+        finally:
+            job.finished_at = time.time()
+            self._save(job)
+            # Finished jobs are read back from their state file like any other worker's
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            tracing.JOBS.inc(kind=job.kind, status=job.status)
+            tracing.JOB_SECONDS.observe(job.finished_at - job.started_at, kind=job.kind)
+            tracing.flush()
+
+    def _state_path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _save(self, job):
+        with self._write_lock:
+            with self._lock:
+                job.heartbeat_at = time.time()
+                state = job.to_dict()
+            self._write_state(state)
+
+    def _write_state(self, state):
+        path = self._state_path(state['id'])
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def _events_path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.events.jsonl")
+
+    def _append_event(self, job_id, event):
+        line = json.dumps(event) + '\n'
+        with self._lock:
+            with open(self._events_path(job_id), 'a') as f:
+                f.write(line)
+
+    def events(self, job_id, offset=0):
+        """Return ([(next_offset, event), ...], offset) for events published after `offset`.
+
+        Offsets are byte positions in the job's event log, so a client can
+        resume from the last one it saw, whichever worker serves it.
+        """
+        if not job_id.isalnum():
+            return [], offset
+        try:
+            with open(self._events_path(job_id), 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return [], offset
+
+        events = []
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break  # still being written
+            offset += len(line)
+            try:
+                events.append((offset, json.loads(line)))
+            except ValueError:
+                continue
+        return events, offset
+
+    def _load(self, job_id):
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._state_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
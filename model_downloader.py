@@ -1,11 +1,46 @@
 import os
+import json
+import fcntl
+import time
+import hashlib
+import threading
+import urllib.error
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
 
+from your_colab_code.model_registry import get_yolo_path
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Optional JSON manifest: {"yolov8.weights": {"url": "...", "sha256": "..."}, ...}.
+# The *_URL / *_SHA256 environment variables fill in or override its entries.
+MODEL_MANIFEST = os.getenv('MODEL_MANIFEST', 'model_manifest.json')
+MODEL_DOWNLOAD_WORKERS = int(os.getenv('MODEL_DOWNLOAD_WORKERS', '3'))
+MODEL_DOWNLOAD_RETRIES = int(os.getenv('MODEL_DOWNLOAD_RETRIES', '3'))
+MODEL_DOWNLOAD_TIMEOUT = float(os.getenv('MODEL_DOWNLOAD_TIMEOUT', '60'))
+CHUNK_SIZE = 1024 * 1024
+# A download whose status file has not changed for this long lost its process
+MODEL_DOWNLOAD_STALL_SECONDS = 2 * MODEL_DOWNLOAD_TIMEOUT + 30
+# Progress is written to the status file at most this often
+STATUS_WRITE_INTERVAL = 1.0
+
+MODEL_ENV = {
+    "yolov8.weights": "YOLO_WEIGHTS",
+    "yolov8.cfg": "YOLO_CFG",
+    "classes.names": "YOLO_CLASSES",
+}
+
+_status_lock = threading.Lock()
+# Last status written per model file by this process, and when
+_status = {}
+_status_written = {}
+
+class ChecksumError(Exception):
+    """A downloaded file does not match the SHA-256 in the manifest."""
+
 def convert_google_drive_link(url):
     """Convert Google Drive share link to direct download link"""
     if 'drive.google.com' in url and '/file/d/' in url:
@@ -13,54 +48,274 @@ def convert_google_drive_link(url):
         return f"https://drive.google.com/uc?export=download&id={file_id}"
     return url
 
-def download_file(url, destination):
-    """Download a file from URL to destination"""
-    try:
-        logger.info(f"Downloading {destination.name}...")
-        urllib.request.urlretrieve(url, destination)
-        logger.info(f"✓ Successfully downloaded {destination.name}")
+def default_model_dir():
+    return Path(get_yolo_path())
+
+def load_manifest(path=None):
+    """Return {filename: {'url': ..., 'sha256': ...}} from the manifest file and environment"""
+    path = Path(path or MODEL_MANIFEST)
+    manifest = {filename: {'url': '', 'sha256': ''} for filename in MODEL_ENV}
+    if path.exists():
+        with open(path) as f:
+            for filename, entry in json.load(f).items():
+                manifest.setdefault(filename, {'url': '', 'sha256': ''}).update(entry)
+    for filename, prefix in MODEL_ENV.items():
+        manifest[filename]['url'] = os.getenv(f"{prefix}_URL") or manifest[filename].get('url', '')
+        manifest[filename]['sha256'] = (os.getenv(f"{prefix}_SHA256") or manifest[filename].get('sha256', '')).lower()
+    return manifest
+
+def sha256_of(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def _verified_marker(path):
+    return path.with_name(f".{path.name}.sha256")
+
+def verify_file(path, sha256):
+    """Check `path` against `sha256`, skipping the hash if it is unchanged since the last check"""
+    if not sha256:
+        return True
+    marker = _verified_marker(path)
+    stat = path.stat()
+    stamp = f"{sha256} {stat.st_size} {stat.st_mtime_ns}"
+    if marker.exists() and marker.read_text().strip() == stamp:
         return True
-    except Exception as e:
-        logger.error(f"✗ Failed to download {destination.name}: {e}")
+    if sha256_of(path) != sha256:
         return False
+    marker.write_text(stamp)
+    return True
 
-def ensure_models_exist():
-    """Download model files if they don't exist"""
-    base_dir = Path(__file__).parent
-    model_dir = base_dir / "segmentation" / "documents-segment-classification-main" / "yolo-coco"
-    model_dir.mkdir(parents=True, exist_ok=True)
+def _status_path(path):
+    return path.with_name(f".{path.name}.status.json")
+
+def _set_status(path, **fields):
+    """Record the download state of model file `path` in a status file next to it
+    
+    The file is what every worker reads, so a download running in the
+    gunicorn master (or a worker that has since exited) is reported the
+    same everywhere. Byte counts are written at most every
+    STATUS_WRITE_INTERVAL seconds; state changes are written at once.
+    """
+    now = time.time()
+    with _status_lock:
+        status = _status.setdefault(path, {})
+        changed = 'state' in fields and fields['state'] != status.get('state')
+        status.update(fields)
+        if not changed and now - _status_written.get(path, 0) < STATUS_WRITE_INTERVAL:
+            return
+        _status_written[path] = now
+        state = dict(status, pid=os.getpid(), updated_at=now)
     
-    models = {
-        "yolov8.weights": os.getenv("YOLO_WEIGHTS_URL", ""),
-        "yolov8.cfg": os.getenv("YOLO_CFG_URL", ""),
-        "classes.names": os.getenv("YOLO_CLASSES_URL", "")
-    }
+    status_path = _status_path(path)
+    tmp_path = status_path.with_name(f"{status_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, status_path)
+    except OSError as e:
+        logger.warning(f"Could not record the download state of {path.name}: {e}")
+
+def _read_status(path):
+    try:
+        return json.loads(_status_path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+def download_status(model_dir=None, manifest=None):
+    """Overall state and per-file progress of the model downloads, whichever process runs them"""
+    model_dir = Path(model_dir or default_model_dir())
+    manifest = manifest if manifest is not None else load_manifest()
+    files = {}
+    for filename in manifest:
+        status = _read_status(model_dir / filename)
+        if (model_dir / filename).exists():
+            status['state'] = 'done'
+        files[filename] = status
     
-    all_downloaded = True
+    states = {status.get('state') for status in files.values()}
+    if states == {'done'}:
+        state = 'done'
+    elif states & {'downloading', 'retrying'}:
+        state = 'running'
+    elif states & {'failed', 'missing'}:
+        state = 'failed'
+    else:
+        state = 'idle'
+    return {'state': state, 'files': files}
+
+def _fetch(url, part_path, destination):
+    """Download `url` into `part_path`, resuming from whatever is already there"""
+    hasher = hashlib.sha256()
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    request = urllib.request.Request(url, headers={'Range': f"bytes={offset}-"} if offset else {})
+    try:
+        response = urllib.request.urlopen(request, timeout=MODEL_DOWNLOAD_TIMEOUT)
+    except urllib.error.HTTPError as e:
+        if e.code != 416 or not offset:
+            raise
+        # Range starts at the end of the file: the partial download is complete
+        return sha256_of(part_path)
     
-    for filename, url in models.items():
-        filepath = model_dir / filename
+    with response:
+        if offset and response.status == 206:
+            logger.info(f"Resuming {destination.name} at {offset / (1024 * 1024):.1f} MB")
+            with open(part_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+            mode = 'ab'
+        else:
+            # The server ignored the Range header (or there was nothing to resume)
+            offset = 0
+            mode = 'wb'
+        length = response.headers.get('Content-Length')
+        total = offset + int(length) if length else None
+        _set_status(destination, state='downloading', bytes=offset, total=total, error=None)
         
-        if filepath.exists():
+        done = offset
+        with open(part_path, mode) as f:
+            for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+                f.write(chunk)
+                hasher.update(chunk)
+                done += len(chunk)
+                _set_status(destination, bytes=done)
+            f.flush()
+            os.fsync(f.fileno())
+    if total is not None and done < total:
+        raise IOError(f"connection closed after {done} of {total} bytes")
+    return hasher.hexdigest()
+
+def download_file(url, destination, sha256=''):
+    """Download a file from URL to destination
+    
+    Resumes a partial `<destination>.part` with an HTTP Range request,
+    retries with backoff, checks `sha256` when given and only then moves
+    the file into place, so `destination` is either absent or complete.
+    """
+    destination = Path(destination)
+    part_path = destination.with_name(destination.name + '.part')
+    sha256 = (sha256 or '').lower()
+    # Workers booting together must not append to the same .part file
+    with open(destination.with_name(f".{destination.name}.lock"), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if destination.exists():
+            _set_status(destination, state='done', error=None)
+            return True
+        return _download_locked(url, destination, part_path, sha256)
+
+def _download_locked(url, destination, part_path, sha256):
+    error = None
+    for attempt in range(1, MODEL_DOWNLOAD_RETRIES + 1):
+        try:
+            logger.info(f"Downloading {destination.name}...")
+            digest = _fetch(url, part_path, destination)
+            if sha256 and digest != sha256:
+                # Corrupt rather than short: resuming would keep the bad bytes
+                part_path.unlink()
+                raise ChecksumError(f"SHA-256 mismatch for {destination.name}: got {digest}, expected {sha256}")
+            os.replace(part_path, destination)
+            if sha256:
+                verify_file(destination, sha256)
+            _set_status(destination, state='done', error=None)
+            logger.info(f"✓ Successfully downloaded {destination.name}")
+            return True
+        except Exception as e:
+            logger.warning(f"Download of {destination.name} failed (attempt {attempt}/{MODEL_DOWNLOAD_RETRIES}): {e}")
+            error = str(e) or type(e).__name__
+            if attempt < MODEL_DOWNLOAD_RETRIES:
+                _set_status(destination, state='retrying', error=error, attempt=attempt)
+                time.sleep(min(2 ** attempt, 30))
+    _set_status(destination, state='failed', error=error)
+    logger.error(f"✗ Failed to download {destination.name}")
+    return False
+
+def _ensure_file(filepath, entry):
+    filename = filepath.name
+    if filepath.exists():
+        if verify_file(filepath, entry['sha256']):
             logger.info(f"✓ {filename} already exists")
-            continue
-        
-        if not url:
-            logger.warning(f"⚠ {filename} not found and no URL provided")
-            all_downloaded = False
-            continue
-        
-        # Convert Google Drive link if needed
-        download_url = convert_google_drive_link(url)
-        
-        if not download_file(download_url, filepath):
-            all_downloaded = False
+            _set_status(filepath, state='done', error=None)
+            return True
+        logger.warning(f"⚠ {filename} does not match its SHA-256; downloading it again")
+        filepath.unlink()
+    
+    if not entry['url']:
+        logger.warning(f"⚠ {filename} not found and no URL provided")
+        _set_status(filepath, state='missing', error='no download URL configured')
+        return False
+    
+    # Convert Google Drive link if needed
+    return download_file(convert_google_drive_link(entry['url']), filepath, entry['sha256'])
+
+def ensure_models_exist(model_dir=None, manifest=None, workers=None):
+    """Download missing or corrupt model files, several at a time"""
+    model_dir = Path(model_dir or default_model_dir())
+    model_dir.mkdir(parents=True, exist_ok=True)
+    manifest = manifest if manifest is not None else load_manifest()
+    
+    with ThreadPoolExecutor(max_workers=workers or MODEL_DOWNLOAD_WORKERS, thread_name_prefix='model-download') as pool:
+        results = list(pool.map(lambda item: _ensure_file(model_dir / item[0], item[1]), manifest.items()))
+    all_downloaded = all(results)
     
     if not all_downloaded:
         logger.warning("Some model files are missing. The application may not work correctly.")
     
     return all_downloaded
 
+def ensure_models_in_background(model_dir=None, manifest=None, workers=None, on_done=None):
+    """Run ensure_models_exist on a daemon thread; `on_done(ok)` is called when it finishes"""
+    def run():
+        ok = ensure_models_exist(model_dir, manifest, workers)
+        if on_done:
+            on_done(ok)
+    
+    thread = threading.Thread(target=run, name='model-downloader', daemon=True)
+    thread.start()
+    return thread
+
+def models_ready(model_dir=None, manifest=None):
+    """Whether every model file is in place
+    
+    Files only appear once complete and verified, so this is safe to call
+    from any worker while another process is still downloading.
+    """
+    model_dir = Path(model_dir or default_model_dir())
+    manifest = manifest if manifest is not None else load_manifest()
+    return all((model_dir / filename).exists() for filename in manifest)
+
+def missing_models_reason(model_dir=None, manifest=None):
+    """Why ML uploads cannot run yet, for the client, or None once every model file is in place"""
+    model_dir = Path(model_dir or default_model_dir())
+    manifest = manifest if manifest is not None else load_manifest()
+    now = time.time()
+    reasons = []
+    for filename, entry in manifest.items():
+        path = model_dir / filename
+        if path.exists():
+            continue
+        status = _read_status(path)
+        state = status.get('state')
+        if not entry['url']:
+            prefix = MODEL_ENV.get(filename)
+            setting = f"{prefix}_URL or {MODEL_MANIFEST}" if prefix else MODEL_MANIFEST
+            reasons.append(f"{filename} is missing and has no download URL (set {setting})")
+        elif state == 'failed':
+            reasons.append(f"downloading {filename} failed: {status.get('error')}")
+        elif state in ('downloading', 'retrying') and now - status.get('updated_at', 0) > MODEL_DOWNLOAD_STALL_SECONDS:
+            reasons.append(f"the download of {filename} stopped {(now - status['updated_at']) / 60:.0f} minutes ago; "
+                           f"restart the app to resume it")
+        elif state == 'retrying':
+            reasons.append(f"{filename} is being downloaded again after an error ({status.get('error')})")
+        elif state == 'downloading':
+            done = status.get('bytes', 0) / (1024 * 1024)
+            total = f" of {status['total'] / (1024 * 1024):.1f}" if status.get('total') else ''
+            reasons.append(f"{filename} is still downloading ({done:.1f}{total} MB)")
+        else:
+            reasons.append(f"{filename} has not been downloaded yet")
+    if not reasons:
+        return None
+    return "The detection models are not available: " + "; ".join(reasons) + "."
+
 if __name__ == "__main__":
     ensure_models_exist()
-
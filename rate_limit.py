@@ -0,0 +1,70 @@
+import time
+import random
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` tokens are available and take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def status_code(exc):
+    """Best-effort HTTP status of an API client exception (None if unknown).
+
+    google.api_core errors expose it as `code`, Groq/httpx errors as
+    `status_code` or `response.status_code`.
+    """
+    for value in (getattr(exc, 'code', None), getattr(exc, 'status_code', None),
+                  getattr(getattr(exc, 'response', None), 'status_code', None)):
+        if isinstance(value, int):
+            return int(value)
+    return None
+
+
+def is_retryable(exc):
+    return status_code(exc) in RETRYABLE_STATUS_CODES
+
+
+def call_with_retries(func, bucket=None, max_retries=4, base_delay=1.0, max_delay=30.0, sleep=time.sleep):
+    """Call `func()` under an optional rate limit, retrying 429/5xx errors.
+
+    Retries back off exponentially with full jitter so that concurrent
+    callers hitting the same quota do not retry in lockstep.
+    """
+    attempt = 0
+    while True:
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            logger.warning(f"Retryable API error ({status_code(e)}), retrying in {delay:.1f}s: {e}")
+            sleep(delay)
+            attempt += 1
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', 'result_cache.db')
+RESULT_CACHE_MAX_MB = int(os.getenv('RESULT_CACHE_MAX_MB', '2048'))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '500'))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def save_and_hash(stream, destination):
+    """Copy an upload stream to `destination` and return its SHA-256 hex digest."""
+    hasher = hashlib.sha256()
+    with open(destination, 'wb') as f:
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+            f.write(chunk)
+    return hasher.hexdigest()
+
+
+def _walk_strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _walk_strings(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _walk_strings(item)
+
+
+def referenced_files(result):
+    """Return the set of static/ artifact paths a result points at."""
+    return {value for value in _walk_strings(result) if value.startswith('static/')}
+
+
+class ResultCache:
+    """Pipeline results keyed by (PDF hash, pipeline kind, pipeline version).
+
+    Entries live in SQLite so every gunicorn worker shares them. The size
+    of an entry is its JSON plus the artifact files it references (page
+    images, crops, audio); the least recently used entries are evicted
+    once the cache exceeds its byte or entry budget.
+    """
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+                 max_entries=RESULT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        with self._connect() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS results (
+                                key TEXT PRIMARY KEY,
+                                pdf_hash TEXT NOT NULL,
+                                kind TEXT NOT NULL,
+                                version TEXT NOT NULL,
+                                result TEXT NOT NULL,
+                                size_bytes INTEGER NOT NULL,
+                                created_at REAL NOT NULL,
+                                last_access REAL NOT NULL)''')
+            conn.execute('CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)')
+            conn.execute('''CREATE TABLE IF NOT EXISTS counters (
+                                name TEXT PRIMARY KEY,
+                                value INTEGER NOT NULL)''')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    @staticmethod
+    def make_key(pdf_hash, kind, version):
+        return f"{kind}:{version}:{pdf_hash}"
+
+    def _count(self, conn, name):
+        conn.execute('INSERT INTO counters (name, value) VALUES (?, 1) '
+                     'ON CONFLICT(name) DO UPDATE SET value = value + 1', (name,))
+
+    def get(self, pdf_hash, kind, version):
+        """Return the cached result, or None on a miss."""
+        key = self.make_key(pdf_hash, kind, version)
+        with self._connect() as conn:
+            row = conn.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                result = json.loads(row[0])
+                if all(os.path.isfile(p) for p in referenced_files(result)):
+                    conn.execute('UPDATE results SET last_access = ? WHERE key = ?', (time.time(), key))
+                    self._count(conn, 'hits')
+                    return result
+                # An artifact was deleted underneath us; the entry is useless
+                conn.execute('DELETE FROM results WHERE key = ?', (key,))
+            self._count(conn, 'misses')
+        return None
+
+    def put(self, pdf_hash, kind, version, result):
+        key = self.make_key(pdf_hash, kind, version)
+        payload = json.dumps(result)
+        size_bytes = len(payload) + sum(os.path.getsize(p) for p in referenced_files(result) if os.path.isfile(p))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO results '
+                         '(key, pdf_hash, kind, version, result, size_bytes, created_at, last_access) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         (key, pdf_hash, kind, version, payload, size_bytes, now, now))
+            self._evict(conn)
+
+    def referenced_paths(self):
+        """Every artifact path referenced by a cached result; these must not be deleted."""
+        paths = set()
+        with self._connect() as conn:
+            for (payload,) in conn.execute('SELECT result FROM results'):
+                paths.update(referenced_files(json.loads(payload)))
+        return paths
+
+    def _evict(self, conn):
+        total_bytes, total_entries = conn.execute(
+            'SELECT COALESCE(SUM(size_bytes), 0), COUNT(*) FROM results').fetchone()
+        if total_bytes <= self.max_bytes and total_entries <= self.max_entries:
+            return
+        rows = conn.execute('SELECT key, size_bytes FROM results ORDER BY last_access').fetchall()
+        for key, size_bytes in rows:
+            if total_bytes <= self.max_bytes and total_entries <= self.max_entries:
+                break
+            conn.execute('DELETE FROM results WHERE key = ?', (key,))
+            total_bytes -= size_bytes
+            total_entries -= 1
+            self._count(conn, 'evictions')
+            logger.info(f"Evicted cached result {key}")
+
+    def stats(self):
+        with self._connect() as conn:
+            counters = dict(conn.execute('SELECT name, value FROM counters').fetchall())
+            total_bytes, total_entries = conn.execute(
+                'SELECT COALESCE(SUM(size_bytes), 0), COUNT(*) FROM results').fetchone()
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'evictions': counters.get('evictions', 0),
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            'entries': total_entries,
+            'size_mb': round(total_bytes / (1024 * 1024), 1),
+            'max_mb': round(self.max_bytes / (1024 * 1024), 1),
+        }
@@ -0,0 +1,133 @@
+import os
+import time
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESULT_STORE_PATH = os.getenv('RESULT_STORE_PATH', 'result_store.db')
+RESULT_STORE_MAX_JOBS = int(os.getenv('RESULT_STORE_MAX_JOBS', '1000'))
+
+
+class ResultStore:
+    """Finished ML results keyed by job id, readable from every gunicorn worker.
+
+    A result's annotated pages and segments are stored one row each, so
+    the result pages can show a slice of a 500-segment document without
+    loading all of it. Jobs beyond `max_jobs` are dropped least recently
+    viewed first; the artifact files themselves are left alone.
+    """
+
+    def __init__(self, path=RESULT_STORE_PATH, max_jobs=RESULT_STORE_MAX_JOBS):
+        self.path = path
+        self.max_jobs = max_jobs
+        with self._connect() as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                                job_id TEXT PRIMARY KEY,
+                                page_count INTEGER NOT NULL,
+                                segment_count INTEGER NOT NULL,
+                                created_at REAL NOT NULL,
+                                last_access REAL NOT NULL)''')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_last_access ON jobs (last_access)')
+            conn.execute('''CREATE TABLE IF NOT EXISTS pages (
+                                job_id TEXT NOT NULL,
+                                position INTEGER NOT NULL,
+                                image_url TEXT NOT NULL,
+                                PRIMARY KEY (job_id, position))''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS segments (
+                                job_id TEXT NOT NULL,
+                                position INTEGER NOT NULL,
+                                image_url TEXT NOT NULL,
+                                text TEXT NOT NULL,
+                                latex TEXT NOT NULL,
+                                audio_url TEXT NOT NULL,
+                                PRIMARY KEY (job_id, position))''')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def save(self, job_id, result):
+        """Store the template data returned by run_ml_job for `job_id`."""
+        segments = list(zip(result['image_urls_with_details'], result['texts'],
+                            result['latex'], result['audio_urls']))
+        now = time.time()
+        with self._connect() as conn:
+            self._delete(conn, job_id)
+            conn.execute('INSERT INTO jobs (job_id, page_count, segment_count, created_at, last_access) '
+                         'VALUES (?, ?, ?, ?, ?)', (job_id, len(result['image_urls']), len(segments), now, now))
+            conn.executemany('INSERT INTO pages (job_id, position, image_url) VALUES (?, ?, ?)',
+                             [(job_id, i, url) for i, url in enumerate(result['image_urls'])])
+            conn.executemany('INSERT INTO segments (job_id, position, image_url, text, latex, audio_url) '
+                             'VALUES (?, ?, ?, ?, ?, ?)',
+                             [(job_id, i) + tuple(segment) for i, segment in enumerate(segments)])
+            self._evict(conn)
+
+    def counts(self, job_id):
+        """Return (page_count, segment_count), or None for an unknown job."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT page_count, segment_count FROM jobs WHERE job_id = ?',
+                               (job_id,)).fetchone()
+            if row is not None:
+                conn.execute('UPDATE jobs SET last_access = ? WHERE job_id = ?', (time.time(), job_id))
+        return row
+
+    def page_slice(self, job_id, offset, limit):
+        """Annotated page image URLs `offset` to `offset + limit`."""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT image_url FROM pages WHERE job_id = ? AND position >= ? '
+                                'ORDER BY position LIMIT ?', (job_id, offset, limit)).fetchall()
+        return [row[0] for row in rows]
+
+    def segment_slice(self, job_id, offset, limit):
+        """Segments `offset` to `offset + limit` as the lists result.html expects."""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT image_url, text, latex, audio_url FROM segments '
+                                'WHERE job_id = ? AND position >= ? ORDER BY position LIMIT ?',
+                                (job_id, offset, limit)).fetchall()
+        return {
+            'image_urls_with_details': [row[0] for row in rows],
+            'texts': [row[1] for row in rows],
+            'latex': [row[2] for row in rows],
+            'audio_urls': [row[3] for row in rows],
+        }
+
+    def audio_paths(self):
+        """Audio clips of every stored result; they live in the shared TTS cache, not the job's tree."""
+        with self._connect() as conn:
+            return {row[0] for row in conn.execute('SELECT DISTINCT audio_url FROM segments')}
+
+    def forget(self, job_id):
+        """Drop a job's stored result, e.g. once its artifacts have been deleted."""
+        with self._connect() as conn:
+            self._delete(conn, job_id)
+
+    def forget_under(self, directory):
+        """Drop every stored result showing images from `directory` and return their job ids.
+
+        A cache hit stores the original job's image paths under its own job
+        id, so deleting one job tree can orphan the results of several jobs.
+        """
+        prefix = directory.replace(os.sep, '/').strip('/') + '/'
+        with self._connect() as conn:
+            rows = conn.execute("SELECT job_id FROM pages WHERE substr(ltrim(image_url, '/'), 1, ?) = ? "
+                                "UNION SELECT job_id FROM segments WHERE substr(ltrim(image_url, '/'), 1, ?) = ?",
+                                (len(prefix), prefix, len(prefix), prefix)).fetchall()
+            for (job_id,) in rows:
+                self._delete(conn, job_id)
+        return sorted(row[0] for row in rows)
+
+    def _delete(self, conn, job_id):
+        for table in ('jobs', 'pages', 'segments'):
+            conn.execute(f'DELETE FROM {table} WHERE job_id = ?', (job_id,))
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+        if total <= self.max_jobs:
+            return
+        rows = conn.execute('SELECT job_id FROM jobs ORDER BY last_access LIMIT ?',
+                            (total - self.max_jobs,)).fetchall()
+        for (job_id,) in rows:
+            self._delete(conn, job_id)
+            logger.info(f"Dropped stored result of job {job_id}")
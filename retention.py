@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import fcntl
+import shutil
+import threading
+import logging
+
+from tracing import Counter, flush, prune_metrics
+from your_colab_code.tts_cache import TTS_CACHE_DIR, TTS_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps (0 disables the background sweeper)
+RETENTION_INTERVAL_SECONDS = float(os.getenv('RETENTION_INTERVAL_SECONDS', '600'))
+# Artifacts unused for this long are deleted even under quota (0 keeps them)
+RETENTION_MAX_AGE_HOURS = float(os.getenv('RETENTION_MAX_AGE_HOURS', '72'))
+# Nothing younger than this is touched: uploads not yet queued, files being written
+RETENTION_GRACE_SECONDS = float(os.getenv('RETENTION_GRACE_SECONDS', '900'))
+RETENTION_STATE_PATH = os.getenv('RETENTION_STATE_PATH', 'retention_state.json')
+
+# Byte quota per directory in MB; RETENTION_QUOTAS="uploads=512,static/jobs=8192" overrides
+DEFAULT_QUOTAS_MB = {
+    'uploads': 1024,
+    'static/jobs': 4096,
+    'static/page_images': 2048,
+    'static/cropped_images': 512,
+    'static/outputs': 512,
+    'static/segmentated_images': 512,
+    TTS_CACHE_DIR: TTS_CACHE_MAX_MB,
+}
+
+EVICTED_BYTES = Counter('accasm_retention_evicted_bytes_total', 'Bytes deleted by the retention sweeper',
+                        ('directory', 'reason'))
+
+
+def parse_quotas(spec):
+    """'uploads=512,static/jobs=8192' -> {directory: bytes} on top of DEFAULT_QUOTAS_MB."""
+    quotas = dict(DEFAULT_QUOTAS_MB)
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        directory, _, megabytes = part.partition('=')
+        try:
+            quotas[directory.strip().rstrip('/')] = int(megabytes)
+        except ValueError:
+            raise ValueError(f"Invalid RETENTION_QUOTAS entry '{part}'; use directory=megabytes")
+    return {directory: megabytes * 1024 * 1024 for directory, megabytes in quotas.items()}
+
+
+class Unit:
+    """One evictable thing: a file, or a whole static/jobs/<job_id> tree."""
+
+    def __init__(self, path, size, last_used, files):
+        self.path = path
+        self.size = size
+        self.last_used = last_used
+        self.files = files
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    # Views and cache hits refresh atime where the mount allows it, writes refresh mtime
+    return stat.st_size, max(stat.st_mtime, stat.st_atime)
+
+
+def _tree_unit(path):
+    size = 0
+    last_used = 0.0
+    files = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                file_size, file_used = _file_stat(os.path.join(root, name))
+            except OSError:
+                continue
+            size += file_size
+            last_used = max(last_used, file_used)
+            files += 1
+    if not files:
+        last_used = os.stat(path).st_mtime
+    return Unit(path, size, last_used, files)
+
+
+def scan(directory):
+    """Return the units of `directory`: job trees under static/jobs, files everywhere else."""
+    units = []
+    if not os.path.isdir(directory):
+        return units
+    per_job = os.path.normpath(directory) == os.path.normpath(os.path.join('static', 'jobs'))
+    with os.scandir(directory) as it:
+        for entry in it:
+            try:
+                if per_job and entry.is_dir(follow_symlinks=False):
+                    units.append(_tree_unit(entry.path))
+                elif entry.is_dir(follow_symlinks=False):
+                    for root, _, names in os.walk(entry.path):
+                        for name in names:
+                            path = os.path.join(root, name)
+                            size, last_used = _file_stat(path)
+                            units.append(Unit(path, size, last_used, 1))
+                elif entry.is_file(follow_symlinks=False):
+                    size, last_used = _file_stat(entry.path)
+                    units.append(Unit(entry.path, size, last_used, 1))
+            except OSError:
+                continue  # deleted while we looked
+    return units
+
+
+class RetentionManager:
+    """Keeps artifact directories within their byte quotas.
+
+    Each sweep deletes, per directory, units unused for longer than
+    `max_age_hours`, then the least recently used ones until the directory
+    fits its quota. Files referenced by cached results, audio clips of
+    stored results, artifacts of queued or running jobs and anything
+    younger than the grace period are never deleted. Each sweep also prunes
+    the state files of long-finished jobs and the metrics files of exited
+    processes. A file lock lets only one gunicorn worker sweep at a time;
+    the last sweep's summary is shared through `state_path`.
+    """
+
+    def __init__(self, job_queue, result_cache, result_store=None, quotas=None,
+                 max_age_hours=RETENTION_MAX_AGE_HOURS, grace_seconds=RETENTION_GRACE_SECONDS,
+                 state_path=RETENTION_STATE_PATH):
+        self.job_queue = job_queue
+        self.result_cache = result_cache
+        self.result_store = result_store
+        self.quotas = quotas if quotas is not None else parse_quotas(os.getenv('RETENTION_QUOTAS'))
+        self.max_age_seconds = max_age_hours * 3600
+        self.grace_seconds = grace_seconds
+        self.state_path = state_path
+        # Live jobs may still read their upload or reuse clips from the shared cache
+        self.live_directories = tuple(os.path.normpath(d) for d in ('uploads', TTS_CACHE_DIR))
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _protected(self):
+        """Paths (normalized) that must survive this sweep, and the oldest live job's creation time."""
+        protected = {os.path.normpath(path) for path in self.result_cache.referenced_paths()}
+        if self.result_store is not None:
+            protected.update(os.path.normpath(path) for path in self.result_store.audio_paths())
+        live_since = None
+        for job in self.job_queue.live_jobs():
+            protected.add(os.path.normpath(os.path.join('static', 'jobs', job['id'])))
+            live_since = job['created_at'] if live_since is None else min(live_since, job['created_at'])
+        return protected, live_since
+
+    def _is_protected(self, unit, protected, live_since, now):
+        if now - unit.last_used < self.grace_seconds:
+            return True
+        path = os.path.normpath(unit.path)
+        if path in protected:
+            return True
+        if os.path.isdir(unit.path):
+            prefix = path + os.sep
+            return any(p.startswith(prefix) for p in protected)
+        in_live_directory = any(path.startswith(directory + os.sep) for directory in self.live_directories)
+        return in_live_directory and live_since is not None and unit.last_used >= live_since - self.grace_seconds
+
+    def _delete(self, unit):
+        try:
+            if os.path.isdir(unit.path):
+                shutil.rmtree(unit.path)
+                if self.result_store is not None:
+                    self.result_store.forget(os.path.basename(unit.path))
+                    # Cache hits of this job show its images under their own job ids
+                    self.result_store.forget_under(unit.path)
+            else:
+                os.remove(unit.path)
+            return True
+        except OSError as e:
+            logger.warning(f"Could not delete {unit.path}: {e}")
+            return False
+
+    def sweep(self):
+        """Run one sweep now (unless another process is sweeping) and return its summary."""
+        lock_path = f"{self.state_path}.lock"
+        with open(lock_path, 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            return self._sweep()
+
+    def _sweep(self):
+        start_time = time.time()
+        protected, live_since = self._protected()
+        summary = {'started_at': start_time, 'directories': {}}
+        for directory, quota in self.quotas.items():
+            units = scan(directory)
+            total = sum(unit.size for unit in units)
+            evicted = {'age': [0, 0], 'quota': [0, 0]}
+
+            def evict(unit, reason):
+                if self._delete(unit):
+                    evicted[reason][0] += unit.files
+                    evicted[reason][1] += unit.size
+                    EVICTED_BYTES.inc(unit.size, directory=directory, reason=reason)
+                    return True
+                return False
+
+            remaining = []
+            for unit in sorted(units, key=lambda unit: unit.last_used):
+                expired = self.max_age_seconds and start_time - unit.last_used > self.max_age_seconds
+                if expired and not self._is_protected(unit, protected, live_since, start_time) \
+                        and evict(unit, 'age'):
+                    total -= unit.size
+                else:
+                    remaining.append(unit)
+
+            for unit in remaining:
+                if total <= quota:
+                    break
+                if not self._is_protected(unit, protected, live_since, start_time) and evict(unit, 'quota'):
+                    total -= unit.size
+
+            summary['directories'][directory] = {
+                'evicted_files': evicted['age'][0] + evicted['quota'][0],
+                'evicted_mb': round((evicted['age'][1] + evicted['quota'][1]) / (1024 * 1024), 1),
+                'evicted_by_age': evicted['age'][0],
+                'evicted_by_quota': evicted['quota'][0],
+                'size_mb': round(total / (1024 * 1024), 1),
+                'over_quota': total > quota,
+            }
+            if evicted['age'][0] or evicted['quota'][0]:
+                logger.info(f"Retention: freed {summary['directories'][directory]['evicted_mb']} MB "
+                            f"from {directory} ({total / (1024 * 1024):.1f} MB left)")
+        summary['job_state_pruned'] = self.job_queue.prune()
+        summary['metrics_pruned'] = prune_metrics()
+        summary['seconds'] = round(time.time() - start_time, 3)
+        self._save_summary(summary)
+        flush()
+        return summary
+
+    def _save_summary(self, summary):
+        tmp_path = f"{self.state_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(summary, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.warning(f"Could not write {self.state_path}: {e}")
+
+    def last_sweep(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def usage(self, extra_directories=()):
+        """Bytes, file count and oldest/newest use per directory against its quota."""
+        report = {}
+        for directory in list(self.quotas) + [d for d in extra_directories if d not in self.quotas]:
+            units = scan(directory)
+            quota = self.quotas.get(directory)
+            size = sum(unit.size for unit in units)
+            report[directory] = {
+                'size_mb': round(size / (1024 * 1024), 1),
+                'files': sum(unit.files for unit in units),
+                'quota_mb': round(quota / (1024 * 1024), 1) if quota is not None else None,
+                'used_percent': round(100 * size / quota, 1) if quota else None,
+                'oldest_use': min((unit.last_used for unit in units), default=None),
+            }
+        return report
+
+    def start(self, interval=RETENTION_INTERVAL_SECONDS):
+        """Sweep every `interval` seconds on a daemon thread."""
+        if interval <= 0 or self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception:
+                    logger.exception("Retention sweep failed")
+
+        self._thread = threading.Thread(target=loop, name='retention', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -3,6 +3,11 @@ import argparse
 import time
 import cv2
 import os
+import sys
+
+# share the vectorized YOLO decoder with the web app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from your_colab_code.yolo_postprocess import detect_objects
 
 # construct the argument parse and parse the arguments
 yolo_path = 'yolo-coco'
@@ -68,46 +73,13 @@ def pdf2img():
             # show timing information on YOLO 
             print("[INFO] YOLO took {:.6f} seconds".format(end - start))
 
-            # initialize our lists of detected bounding boxes, confidences, and class IDs, respectively
-            boxes = []
-            confidences = []
-            classIDs = []
-
-            # loop over each of the layer outputs
-            for output in layerOutputs:
-                for detection in output:
-                    scores = detection[5:]
-                    classID = np.argmax(scores)
-                    confidence = scores[classID]
-
-                    if confidence > 0.5:
-                        # Scale the bounding box coordinates back relative to the size of the image
-                        box = detection[0:4] * np.array([W, H, W, H])
-                        (centerX, centerY, width, height) = box.astype("int")
-                        x = int(centerX - (width / 2))
-                        y = int(centerY - (height / 2))
-
-                        # Update our list of bounding box coordinates, confidences, and class IDs
-                        boxes.append([x, y, int(width), int(height)])
-                        confidences.append(float(confidence))
-                        classIDs.append(classID)
-
-            # Apply non-maxima suppression to suppress weak, overlapping bounding boxes
-            if len(boxes) > 0:  # Ensure there are boxes to process
-                idxs = cv2.dnn.NMSBoxes(boxes, confidences, score_threshold=0.5, nms_threshold=0.3)
-
-                # Ensure idxs is not empty
-                if len(idxs) > 0:
-                    for i in idxs.flatten():
-                        # Extract bounding box coordinates
-                        (x, y) = (boxes[i][0], boxes[i][1])
-                        (w, h) = (boxes[i][2], boxes[i][3])
-
-                        # Draw a bounding box rectangle and label on the image
-                        color = [int(c) for c in COLORS[classIDs[i]]]
-                        cv2.rectangle(image, (x, y), (x + w, y + h), color, 2)
-                        text = f"{LABELS[classIDs[i]]}: {confidences[i]:.4f}"
-                        cv2.putText(image, text, (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            # decode every layer output at once and apply class-aware non-maxima suppression
+            for (x, y, w, h, confidence, classID) in detect_objects(layerOutputs, W, H, 0.5, 0.3):
+                # Draw a bounding box rectangle and label on the image
+                color = [int(c) for c in COLORS[classID]]
+                cv2.rectangle(image, (x, y), (x + w, y + h), color, 2)
+                text = f"{LABELS[classID]}: {confidence:.4f}"
+                cv2.putText(image, text, (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
 
             imgresize = cv2.resize(image, (960, 520))
             cv2.imshow("Image", imgresize)
@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+# The tests import the application modules the way app.py does, from the repository root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Set before tracing is imported, so exit-time flushes and spawned pool
+# processes write there too instead of the working directory
+os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='metrics_state-')
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture(autouse=True)
+def isolated_metrics_dir(tmp_path, monkeypatch):
+    """Give each test its own metrics directory."""
+    metrics_dir = tmp_path / 'metrics_state'
+    monkeypatch.setattr(tracing, 'METRICS_DIR', str(metrics_dir))
+    return metrics_dir
@@ -0,0 +1,103 @@
+import random
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('google.generativeai')
+Image = pytest.importorskip('PIL.Image')
+
+import gemini_integration
+from gemini_integration import GeminiProcessor
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """Answers each page after a random delay; the first call for some pages hits a 429."""
+
+    def __init__(self, rate_limited_pages=()):
+        self.rate_limited_pages = set(rate_limited_pages)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, parts):
+        prompt, payload = parts
+        page = int(prompt.rsplit('page ', 1)[1].split(' ')[0])
+        with self._lock:
+            self.calls.append(page)
+            first_try = self.calls.count(page) == 1
+        time.sleep(random.uniform(0, 0.02))
+        if first_try and page in self.rate_limited_pages:
+            raise RateLimited(f"quota exceeded on page {page}")
+        assert payload['data']
+        return FakeResponse(f"explanation of page {page}")
+
+
+class FakePageSource:
+    def __init__(self, pdf_path, dpi, pages=None):
+        self.pages = list(pages or range(1, 9))
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __iter__(self):
+        for page in self.pages:
+            yield page - 1, Image.new('RGB', (60, 80), 'white')
+
+
+@pytest.fixture
+def pdf_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(gemini_integration, 'PdfPageSource', FakePageSource)
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(b'%PDF-1.4\n')
+    return str(path)
+
+
+def no_sleep_retries(monkeypatch):
+    real = gemini_integration.call_with_retries
+    monkeypatch.setattr(gemini_integration, 'call_with_retries',
+                        lambda func, **kwargs: real(func, sleep=lambda seconds: None, **kwargs))
+
+
+def test_explanations_stay_in_page_order(pdf_path, monkeypatch):
+    no_sleep_retries(monkeypatch)
+    model = FakeGeminiModel()
+    processor = GeminiProcessor(model=model, concurrency=4, requests_per_minute=6000)
+    events = []
+    result = processor.process_pdf_with_gemini(
+        pdf_path, progress=lambda stage=None, event=None, **counters: event and events.append(event))
+
+    assert result['page_numbers'] == list(range(1, 9))
+    assert result['page_explanations'] == [f"explanation of page {page}" for page in range(1, 9)]
+    assert [url.rsplit('/', 1)[1] for url in result['page_urls']] == \
+        [f"page_{page}_doc.jpg" for page in range(1, 9)]
+    assert sorted(event['page'] for event in events) == list(range(1, 9))
+
+
+def test_rate_limited_pages_are_retried(pdf_path, monkeypatch):
+    no_sleep_retries(monkeypatch)
+    model = FakeGeminiModel(rate_limited_pages={2, 5})
+    processor = GeminiProcessor(model=model, concurrency=3, requests_per_minute=6000, max_retries=2)
+    result = processor.process_pdf_with_gemini(pdf_path, pages=[1, 2, 3, 5])
+
+    assert result['page_explanations'] == [f"explanation of page {page}" for page in (1, 2, 3, 5)]
+    assert sorted(model.calls) == [1, 2, 2, 3, 5, 5]
+
+
+def test_exhausted_retries_return_an_error_response(pdf_path, monkeypatch):
+    no_sleep_retries(monkeypatch)
+    model = FakeGeminiModel(rate_limited_pages={1})
+    processor = GeminiProcessor(model=model, requests_per_minute=6000, max_retries=0)
+    result = processor.process_pdf_with_gemini(pdf_path, pages=[1])
+
+    assert result['page_urls'] == []
+    assert 'quota exceeded' in result['page_explanations'][0]
@@ -0,0 +1,48 @@
+import json
+import os
+import time
+
+import tracing
+from job_queue import DONE, RUNNING, JobQueue
+
+
+def write_job(state_dir, job_id, status, age_hours, events=True):
+    timestamp = time.time() - age_hours * 3600
+    state = {'id': job_id, 'kind': 'ml', 'status': status, 'created_at': timestamp,
+             'heartbeat_at': timestamp, 'finished_at': timestamp if status == DONE else None}
+    paths = [state_dir / f"{job_id}.json"]
+    paths[0].write_text(json.dumps(state))
+    if events:
+        paths.append(state_dir / f"{job_id}.events.jsonl")
+        paths[1].write_text('{"type": "page"}\n')
+    for path in paths:
+        os.utime(path, (timestamp, timestamp))
+
+
+def test_prune_removes_only_long_finished_jobs(tmp_path):
+    state_dir = tmp_path / 'job_state'
+    queue = JobQueue(workers=1, state_dir=str(state_dir), stale_seconds=180)
+    write_job(state_dir, 'old', DONE, age_hours=100)
+    write_job(state_dir, 'recent', DONE, age_hours=1)
+    write_job(state_dir, 'lost', RUNNING, age_hours=100, events=False)
+    (state_dir / 'orphan.events.jsonl').write_text('')
+    os.utime(state_dir / 'orphan.events.jsonl', (0, 0))
+
+    assert queue.prune(max_age_hours=72) == 4
+    assert sorted(os.listdir(state_dir)) == ['recent.events.jsonl', 'recent.json']
+    assert queue.prune(max_age_hours=0) == 0
+
+
+def test_prune_metrics_keeps_files_of_running_processes(isolated_metrics_dir):
+    isolated_metrics_dir.mkdir()
+    alive = isolated_metrics_dir / f"{os.getpid()}-aaaa.json"
+    # pid_max on Linux stays well below this, so the process cannot exist
+    dead = isolated_metrics_dir / '999999999-bbbb.json'
+    recent_dead = isolated_metrics_dir / '999999998-cccc.json'
+    for path in (alive, dead, recent_dead):
+        path.write_text('{}')
+    for path in (alive, dead):
+        os.utime(path, (0, 0))
+
+    assert tracing.prune_metrics(max_age_hours=24) == 1
+    assert sorted(os.listdir(isolated_metrics_dir)) == sorted([alive.name, recent_dead.name])
@@ -0,0 +1,90 @@
+import json
+
+from your_colab_code import llm_batch
+from your_colab_code.llm_batch import convert_segments, make_batches
+
+
+class Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class Choice:
+    def __init__(self, content):
+        self.message = Message(content)
+
+
+class Completion:
+    def __init__(self, content):
+        self.choices = [Choice(content)]
+
+
+class FakeGroq:
+    """Answers batched prompts in JSON, but garbles any batch of more than `max_batch` segments."""
+
+    def __init__(self, max_batch=1, drop_ids=()):
+        self.max_batch = max_batch
+        self.drop_ids = set(drop_ids)
+        self.batch_sizes = []
+        self.single_prompts = []
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages, **kwargs):
+        content = messages[0]['content']
+        if kwargs.get('response_format') is None:
+            text = content.rsplit('\n\n', 1)[1]
+            self.single_prompts.append(text)
+            return Completion(f'"{text.upper()}"')
+
+        segments = json.loads(content[len(llm_batch.BATCH_PROMPT):])
+        self.batch_sizes.append(len(segments))
+        if len(segments) > self.max_batch:
+            return Completion('{"results": [{"id": 0, "english": "trunc')
+        results = [{'id': s['id'], 'english': s['text'].upper()} for s in segments if s['id'] not in self.drop_ids]
+        return Completion(json.dumps({'results': results}))
+
+
+ITEMS = [(i, f"segment {i}") for i in range(6)]
+
+
+def test_batches_respect_count_and_token_budget():
+    assert [len(b) for b in make_batches(ITEMS, batch_size=4, token_budget=10000)] == [4, 2]
+    # Every segment is about three tokens
+    assert [len(b) for b in make_batches(ITEMS, batch_size=10, token_budget=7)] == [2, 2, 2]
+    assert make_batches([(0, 'x' * 400)], batch_size=10, token_budget=10) == [[(0, 'x' * 400)]]
+
+
+def test_one_completion_when_the_answer_parses():
+    client = FakeGroq(max_batch=10)
+    converted = convert_segments(client, ITEMS, 'model', batch_size=10)
+    assert converted == {i: f"SEGMENT {i}" for i in range(6)}
+    assert client.batch_sizes == [6]
+    assert client.single_prompts == []
+
+
+def test_unparseable_batches_are_split_in_half():
+    client = FakeGroq(max_batch=2)
+    converted = convert_segments(client, ITEMS, 'model', batch_size=10)
+    assert converted == {i: f"SEGMENT {i}" for i in range(6)}
+    # 6 fails, both halves of 3 fail, then their 1- and 2-segment parts succeed
+    assert client.batch_sizes == [6, 3, 1, 2, 3, 1, 2]
+    assert client.single_prompts == []
+
+
+def test_single_segment_falls_back_to_the_free_text_prompt():
+    client = FakeGroq(max_batch=10, drop_ids={4})
+    converted = convert_segments(client, ITEMS, 'model', batch_size=10)
+    assert converted == {i: f"SEGMENT {i}" for i in range(6)}
+    assert client.single_prompts == ['segment 4']
+
+
+def test_failed_batch_is_left_out():
+    class Broken(FakeGroq):
+        def create(self, model, messages, **kwargs):
+            if 'segment 1' in messages[0]['content']:
+                raise RuntimeError('connection reset')
+            return super().create(model, messages, **kwargs)
+
+    converted = convert_segments(Broken(max_batch=10), ITEMS, 'model', batch_size=2)
+    assert converted == {i: f"SEGMENT {i}" for i in range(2, 6)}
@@ -0,0 +1,111 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import model_downloader
+from model_downloader import download_file, missing_models_reason
+
+DATA = bytes(range(256)) * 4096  # 1 MiB
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.ranges.append(self.headers.get('Range'))
+        start = 0
+        if self.headers.get('Range') and self.server.honor_range:
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            if start >= len(DATA):
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(DATA)}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(DATA) - 1}/{len(DATA)}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(DATA) - start))
+        self.end_headers()
+        self.wfile.write(DATA[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    httpd.ranges = []
+    httpd.honor_range = True
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/yolov8.weights"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(model_downloader, 'MODEL_DOWNLOAD_RETRIES', 2)
+    monkeypatch.setattr(model_downloader.time, 'sleep', lambda seconds: None)
+
+
+def test_full_download_is_verified_and_moved_into_place(server, tmp_path):
+    destination = tmp_path / 'yolov8.weights'
+    assert download_file(server.url, destination, SHA256)
+    assert destination.read_bytes() == DATA
+    assert not (tmp_path / 'yolov8.weights.part').exists()
+    assert server.ranges == [None]
+
+
+def test_partial_download_resumes_with_a_range_request(server, tmp_path):
+    destination = tmp_path / 'yolov8.weights'
+    (tmp_path / 'yolov8.weights.part').write_bytes(DATA[:300000])
+    assert download_file(server.url, destination, SHA256)
+    assert destination.read_bytes() == DATA
+    assert server.ranges == ['bytes=300000-']
+
+
+def test_complete_part_file_answered_with_416_is_kept(server, tmp_path):
+    destination = tmp_path / 'yolov8.weights'
+    (tmp_path / 'yolov8.weights.part').write_bytes(DATA)
+    assert download_file(server.url, destination, SHA256)
+    assert destination.read_bytes() == DATA
+    assert server.ranges == [f"bytes={len(DATA)}-"]
+
+
+def test_server_ignoring_range_restarts_from_scratch(server, tmp_path):
+    server.honor_range = False
+    destination = tmp_path / 'yolov8.weights'
+    (tmp_path / 'yolov8.weights.part').write_bytes(b'stale bytes')
+    assert download_file(server.url, destination, SHA256)
+    assert destination.read_bytes() == DATA
+
+
+def test_checksum_mismatch_never_produces_the_file(server, tmp_path):
+    destination = tmp_path / 'yolov8.weights'
+    assert not download_file(server.url, destination, 'ab' * 32)
+    assert not destination.exists()
+    assert not (tmp_path / 'yolov8.weights.part').exists()
+    # A corrupt download is fetched again from scratch, never resumed
+    assert server.ranges == [None, None]
+    reason = missing_models_reason(tmp_path, {'yolov8.weights': {'url': server.url, 'sha256': 'ab' * 32}})
+    assert 'downloading yolov8.weights failed: SHA-256 mismatch' in reason
+
+
+def test_missing_models_reason(server, tmp_path):
+    manifest = {
+        'yolov8.weights': {'url': server.url, 'sha256': SHA256},
+        'classes.names': {'url': '', 'sha256': ''},
+    }
+    reason = missing_models_reason(tmp_path, manifest)
+    assert 'yolov8.weights has not been downloaded yet' in reason
+    assert 'classes.names is missing and has no download URL (set YOLO_CLASSES_URL' in reason
+
+    assert download_file(server.url, tmp_path / 'yolov8.weights', SHA256)
+    (tmp_path / 'classes.names').write_text('Equation\nText\n')
+    assert missing_models_reason(tmp_path, manifest) is None
+    assert model_downloader.download_status(tmp_path, manifest)['state'] == 'done'
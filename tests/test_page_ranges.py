@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip('pdf2image')
+
+from your_colab_code import page_source
+from your_colab_code.page_source import (PdfPageSource, check_pages_exist, format_page_ranges,
+                                         parse_page_ranges)
+
+
+@pytest.mark.parametrize('spec, pages', [
+    ('40-45', [40, 41, 42, 43, 44, 45]),
+    ('1,3,5-7', [1, 3, 5, 6, 7]),
+    (' 2 - 3 , 2 ', [2, 3]),
+    ('7,1', [1, 7]),
+    ('4-4', [4]),
+])
+def test_parse_page_ranges(spec, pages):
+    assert parse_page_ranges(spec) == pages
+
+
+@pytest.mark.parametrize('spec', ['', ',', '0', '5-3', 'a-b', '1-2-3', '1-999999999'])
+def test_parse_page_ranges_rejects_bad_input(spec):
+    with pytest.raises(ValueError):
+        parse_page_ranges(spec)
+
+
+def test_format_page_ranges_inverts_parse():
+    assert format_page_ranges([1, 2, 3, 7, 9, 10]) == '1-3,7,9-10'
+    assert parse_page_ranges(format_page_ranges([1, 2, 3, 7, 9, 10])) == [1, 2, 3, 7, 9, 10]
+
+
+@pytest.fixture
+def fifty_page_pdf(tmp_path, monkeypatch):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(b'%PDF-1.4')
+    monkeypatch.setattr(page_source, 'pdfinfo_from_path', lambda pdf_path: {'Pages': 50})
+    return str(path)
+
+
+def test_pages_past_the_end_are_rejected(fifty_page_pdf):
+    check_pages_exist(fifty_page_pdf, parse_page_ranges('45-50'))
+    with pytest.raises(ValueError, match='Pages 51-55 are outside the document, which has 50 pages'):
+        check_pages_exist(fifty_page_pdf, parse_page_ranges('48-55'))
+
+
+def test_page_source_rejects_pages_past_the_end(fifty_page_pdf):
+    assert PdfPageSource(fifty_page_pdf, dpi=90, pages=[1, 50]).pages == [1, 50]
+    with pytest.raises(ValueError):
+        PdfPageSource(fifty_page_pdf, dpi=90, pages=parse_page_ranges('400-405'))
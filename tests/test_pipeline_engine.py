@@ -0,0 +1,31 @@
+from your_colab_code import pipeline_engine
+from your_colab_code.pipeline_engine import StagedPipeline, Stage
+
+
+def test_keyed_stage_batches_items_by_key_across_the_stream():
+    batches = []
+
+    def record(batch):
+        batches.append(list(batch))
+        return batch
+
+    stage = Stage('ocr', record, batch_size=3, batch_key=lambda item: item % 2)
+    results = StagedPipeline([stage]).run(range(8))
+
+    assert sorted(results) == list(range(8))
+    # Full buckets go as soon as they fill; the leftovers at end of stream
+    assert batches == [[0, 2, 4], [1, 3, 5], [6], [7]]
+
+
+def test_process_stage_reuses_one_pool_across_runs():
+    def run():
+        stage = Stage('sort', sorted, batch_size=4, executor='process', pool='test-sort')
+        return StagedPipeline([stage]).run([3, 1, 2])
+
+    try:
+        assert sorted(run()) == [1, 2, 3]
+        pool = pipeline_engine.get_process_pool('test-sort', 1)
+        assert sorted(run()) == [1, 2, 3]
+        assert pipeline_engine.get_process_pool('test-sort', 1) is pool
+    finally:
+        pipeline_engine.discard_process_pool('test-sort', pipeline_engine.get_process_pool('test-sort', 1))
@@ -0,0 +1,116 @@
+import pytest
+
+import rate_limit
+from rate_limit import TokenBucket, call_with_retries, status_code
+
+
+class ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping advances the clock instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def flaky(failures):
+    calls = []
+
+    def func():
+        calls.append(len(calls))
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return 'ok'
+    return func, calls
+
+
+def test_retries_rate_limits_and_server_errors():
+    func, calls = flaky([ApiError(429), ApiError(503)])
+    delays = []
+    assert call_with_retries(func, max_retries=4, base_delay=1.0, sleep=delays.append) == 'ok'
+    assert len(calls) == 3
+    # Full jitter: each delay is drawn below the exponential cap
+    assert 0 <= delays[0] <= 1.0
+    assert 0 <= delays[1] <= 2.0
+
+
+def test_backoff_is_capped():
+    func, _ = flaky([ApiError(429)] * 6)
+    delays = []
+    call_with_retries(func, max_retries=6, base_delay=1.0, max_delay=3.0, sleep=delays.append)
+    assert len(delays) == 6
+    assert max(delays) <= 3.0
+
+
+def test_gives_up_after_max_retries():
+    func, calls = flaky([ApiError(429)] * 10)
+    with pytest.raises(ApiError):
+        call_with_retries(func, max_retries=2, sleep=lambda seconds: None)
+    assert len(calls) == 3
+
+
+def test_client_errors_are_not_retried():
+    func, calls = flaky([ApiError(400)])
+    with pytest.raises(ApiError):
+        call_with_retries(func, sleep=lambda seconds: pytest.fail('should not sleep'))
+    assert len(calls) == 1
+
+
+def test_status_code_from_response_attribute():
+    class Response:
+        status_code = 502
+
+    error = Exception('bad gateway')
+    error.response = Response()
+    assert status_code(error) == 502
+    assert status_code(ValueError('no status')) is None
+
+
+def test_every_attempt_takes_a_token(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    bucket = TokenBucket(rate=1.0, capacity=1)
+    func, calls = flaky([ApiError(429)])
+    call_with_retries(func, bucket=bucket, base_delay=0.0, sleep=clock.sleep)
+    assert len(calls) == 2
+    # The retry waited for a second token
+    assert clock.now - 1000.0 == pytest.approx(1.0)
+
+
+def test_token_bucket_allows_a_burst_then_paces(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    bucket = TokenBucket(rate=2.0, capacity=3)
+
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == []
+
+    for _ in range(4):
+        bucket.acquire()
+    # Four more tokens at two per second
+    assert clock.now - 1000.0 == pytest.approx(2.0)
+
+
+def test_token_bucket_refills_up_to_capacity(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    bucket.acquire(2)
+    clock.now += 60
+    bucket.acquire(2)
+    assert clock.slept == []
+    bucket.acquire()
+    assert clock.slept == [pytest.approx(1.0)]
@@ -0,0 +1,27 @@
+from result_store import ResultStore
+
+
+def make_result(job_id, pages=2):
+    root = f"static/jobs/{job_id}"
+    return {
+        'image_urls': [f"{root}/annotated/page_{i}.png" for i in range(pages)],
+        'image_urls_with_details': [f"{root}/cropped_images/Text/{i}.png" for i in range(pages)],
+        'texts': ['text'] * pages,
+        'latex': [''] * pages,
+        'audio_urls': [f"static/tts_cache/{i}.mp3" for i in range(pages)],
+    }
+
+
+def test_forget_under_drops_cache_hits_pointing_into_a_deleted_tree(tmp_path):
+    store = ResultStore(path=str(tmp_path / 'result_store.db'))
+    store.save('original', make_result('original'))
+    # A cache hit stores the original job's paths under a new job id
+    store.save('cache_hit', make_result('original'))
+    # A tree whose name merely starts the same is left alone
+    store.save('other', make_result('original2'))
+
+    assert store.forget_under('static/jobs/original') == ['cache_hit', 'original']
+    assert store.counts('original') is None
+    assert store.counts('cache_hit') is None
+    assert store.counts('other') == (2, 2)
+    assert store.forget_under('static/jobs/original') == []
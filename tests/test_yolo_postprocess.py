@@ -0,0 +1,40 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+from benchmarks.bench_yolo_decode import LAYER_ROWS, NUM_CLASSES, loop_decode, make_layer_outputs
+from your_colab_code.yolo_postprocess import CONFIDENCE_THRESHOLD, decode_yolo_outputs, detect_objects
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_decode_matches_per_row_loop(seed):
+    rng = np.random.RandomState(seed)
+    outputs = make_layer_outputs(rng, positive_rate=0.01)
+    width, height = 765, 990
+
+    boxes, confidences, class_ids = loop_decode(outputs, width, height, conf_threshold=CONFIDENCE_THRESHOLD)
+    v_boxes, v_confidences, v_class_ids = decode_yolo_outputs(outputs, width, height)
+
+    assert v_boxes.tolist() == boxes
+    assert v_class_ids.tolist() == class_ids
+    np.testing.assert_allclose(v_confidences, confidences, rtol=1e-6)
+
+
+def test_decode_without_detections():
+    outputs = [np.zeros((rows, 5 + NUM_CLASSES), dtype=np.float32) for rows in LAYER_ROWS]
+    boxes, confidences, class_ids = decode_yolo_outputs(outputs, 100, 100)
+    assert boxes.shape == (0, 4)
+    assert len(confidences) == len(class_ids) == 0
+    assert detect_objects(outputs, 100, 100) == []
+
+
+def test_nms_keeps_overlapping_boxes_of_different_classes():
+    # Two identical boxes of different classes and a weaker duplicate of the first
+    output = np.zeros((3, 5 + 2), dtype=np.float32)
+    output[:, 0:4] = [0.5, 0.5, 0.2, 0.2]
+    output[0, 5] = 0.9
+    output[1, 6] = 0.8
+    output[2, 5] = 0.7
+    detections = detect_objects([output], 100, 100)
+    assert sorted((d[5], round(d[4], 2)) for d in detections) == [(0, 0.9), (1, 0.8)]
@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Every process (gunicorn workers and pipeline worker processes) writes its
+# metrics here so /metrics can report totals whichever worker serves it.
+# Set to an empty string to keep metrics per process.
+METRICS_DIR = os.getenv('METRICS_DIR', 'metrics_state')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '1.0'))
+# Files of exited processes are kept this long after their last write, so
+# their counts do not vanish from /metrics the moment a worker restarts
+METRICS_MAX_AGE_HOURS = float(os.getenv('METRICS_MAX_AGE_HOURS', '24'))
+TRACE_SPANS = os.getenv('TRACE_SPANS', '0') == '1'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_current_job = contextvars.ContextVar('job_id', default=None)
+_lock = threading.Lock()
+_metrics = {}
+_process_token = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_last_flush = [0.0]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    """Monotonic count, one series per label combination."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.series = {}
+        _metrics[name] = self
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with _lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    @staticmethod
+    def merge(into, value):
+        return (into or 0) + value
+
+    def render(self, series):
+        lines = []
+        for key, value in sorted(series.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets, one series per label combination."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        _metrics[name] = self
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with _lock:
+            state = self.series.get(key)
+            if state is None:
+                state = self.series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @staticmethod
+    def merge(into, value):
+        if into is None:
+            return {'buckets': list(value['buckets']), 'sum': value['sum'], 'count': value['count']}
+        into['buckets'] = [a + b for a, b in zip(into['buckets'], value['buckets'])]
+        into['sum'] += value['sum']
+        into['count'] += value['count']
+        return into
+
+    def render(self, series):
+        lines = []
+        for key, state in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['buckets']):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', repr(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, [('le', '+Inf')])
+            lines.append(f"{self.name}_bucket{labels} {state['count']}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {round(state['sum'], 6)}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+STAGE_SECONDS = Histogram('accasm_stage_duration_seconds',
+                          'Duration of one pipeline stage span (render, detect, crop_write, crop_render, ocr, groq, tts, gemini_call)',
+                          ('stage',))
+STAGE_ERRORS = Counter('accasm_stage_errors_total', 'Stage spans that ended with an exception', ('stage',))
+JOBS = Counter('accasm_jobs_total', 'Background jobs by kind and final status', ('kind', 'status'))
+JOB_SECONDS = Histogram('accasm_job_duration_seconds', 'Wall time of background jobs', ('kind',))
+
+
+@contextmanager
+def job_context(job_id):
+    """Attribute spans recorded in this context (and threads started from it) to `job_id`."""
+    token = _current_job.set(job_id)
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+
+def record_span(stage, seconds, page=None, job_id=None, error=False, **attrs):
+    """Record a finished span measured by the caller."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if error:
+        STAGE_ERRORS.inc(stage=stage)
+    if TRACE_SPANS:
+        details = ''.join(f" {key}={value}" for key, value in attrs.items())
+        logger.info(f"span stage={stage} job={job_id or _current_job.get()} page={page} "
+                    f"duration={seconds:.4f}s error={error}{details}")
+    _maybe_flush()
+
+
+@contextmanager
+def span(stage, page=None, job_id=None, **attrs):
+    """Time the enclosed block as one `stage` span."""
+    start_time = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record_span(stage, time.perf_counter() - start_time, page=page, job_id=job_id, error=error, **attrs)
+
+
+def snapshot():
+    with _lock:
+        return {name: {json.dumps(key): value for key, value in metric.series.items()}
+                for name, metric in _metrics.items()}
+
+
+def _metrics_path():
+    return os.path.join(METRICS_DIR, f"{_process_token}.json")
+
+
+def flush():
+    """Write this process's metrics to METRICS_DIR for the other workers to read."""
+    if not METRICS_DIR or not any(metric.series for metric in _metrics.values()):
+        return
+    _last_flush[0] = time.time()
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = _metrics_path()
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot(), f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write metrics to {METRICS_DIR}: {e}")
+
+
+def _maybe_flush():
+    if METRICS_DIR and time.time() - _last_flush[0] >= METRICS_FLUSH_SECONDS:
+        flush()
+
+
+def render_metrics():
+    """Prometheus text exposition of the metrics of every process sharing METRICS_DIR."""
+    snapshots = [snapshot()]
+    if METRICS_DIR and os.path.isdir(METRICS_DIR):
+        own = os.path.basename(_metrics_path())
+        for name in os.listdir(METRICS_DIR):
+            if not name.endswith('.json') or name == own:
+                continue
+            try:
+                with open(os.path.join(METRICS_DIR, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+    lines = []
+    for name, metric in _metrics.items():
+        merged = {}
+        for data in snapshots:
+            for key, value in data.get(name, {}).items():
+                key = tuple(json.loads(key))
+                merged[key] = metric.merge(merged.get(key), value)
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        lines.extend(metric.render(merged))
+    return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def prune_metrics(max_age_hours=METRICS_MAX_AGE_HOURS):
+    """Delete metrics files of exited processes not written for `max_age_hours`; return how many."""
+    if not METRICS_DIR or max_age_hours <= 0 or not os.path.isdir(METRICS_DIR):
+        return 0
+    now = time.time()
+    deleted = 0
+    for name in os.listdir(METRICS_DIR):
+        path = os.path.join(METRICS_DIR, name)
+        try:
+            if now - os.path.getmtime(path) <= max_age_hours * 3600:
+                continue
+            pid = name.split('-', 1)[0]
+            # Leftover .tmp files belong to a write that never finished
+            if name.endswith('.json') and pid.isdigit() and _pid_alive(int(pid)):
+                continue
+            os.remove(path)
+            deleted += 1
+        except OSError:
+            continue
+    return deleted
+
+
+def _reset_in_child():
+    # A forked worker process starts its own series and file; otherwise the
+    # parent's counts would be reported twice
+    global _process_token, _lock
+    _lock = threading.Lock()
+    _process_token = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    for metric in _metrics.values():
+        metric.series = {}
+
+
+atexit.register(flush)
+os.register_at_fork(after_in_child=_reset_in_child)
@@ -0,0 +1,92 @@
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+OCR_BATCH_SIZE = int(os.getenv('OCR_BATCH_SIZE', '8'))
+# 0 keeps torch's default intra-op thread count
+OCR_TORCH_THREADS = int(os.getenv('OCR_TORCH_THREADS', '0'))
+
+_threads_configured = False
+
+
+def configure_torch_threads(threads=None):
+    """Apply OCR_TORCH_THREADS to torch once per process."""
+    global _threads_configured
+    threads = OCR_TORCH_THREADS if threads is None else threads
+    if threads and not _threads_configured:
+        import torch
+        torch.set_num_threads(threads)
+        _threads_configured = True
+
+
+def preprocess(latex_ocr, img):
+    """Turn a crop into the (1, 1, H, W) tensor LatexOCR.__call__ would feed its encoder.
+
+    Mirrors pix2tex's own preprocessing, including the optional resizer
+    network that picks the width the encoder reads best at.
+    """
+    import torch
+    from pix2tex.cli import minmax_size
+    from pix2tex.utils import pad
+    from pix2tex.dataset.transforms import test_transform
+
+    args = latex_ocr.args
+    img = minmax_size(pad(img), args.max_dimensions, args.min_dimensions)
+    if latex_ocr.image_resizer is not None and not args.no_resize:
+        with torch.no_grad():
+            input_image = img.convert('RGB').copy()
+            r, w, h = 1, input_image.size[0], input_image.size[1]
+            for _ in range(10):
+                h = int(h * r)
+                resample = Image.Resampling.BILINEAR if r > 1 else Image.Resampling.LANCZOS
+                img = pad(minmax_size(input_image.resize((w, h), resample), args.max_dimensions, args.min_dimensions))
+                t = test_transform(image=np.array(img.convert('RGB')))['image'][:1].unsqueeze(0)
+                w = (latex_ocr.image_resizer(t.to(args.device)).argmax(-1).item() + 1) * 32
+                if w == img.size[0]:
+                    break
+                r = w / img.size[0]
+        return t
+    img = np.array(pad(img).convert('RGB'))
+    return test_transform(image=img)['image'][:1].unsqueeze(0)
+
+
+def recognize_batch(latex_ocr, tensors):
+    """Run one encoder pass and one batched autoregressive decode over same-shaped crops."""
+    import torch
+    from pix2tex.utils import post_process, token2str
+
+    args = latex_ocr.args
+    with torch.no_grad():
+        batch = torch.cat(tensors).to(args.device)
+        dec = latex_ocr.model.generate(batch, temperature=args.get('temperature', .25))
+    return [post_process(text) for text in token2str(dec, latex_ocr.tokenizer)]
+
+
+def recognize_crops(latex_handle, entries):
+    """Recognize (id, tensor) pairs that share an encoder shape in one batch.
+
+    If the batch cannot be run batched, the crops are recognized one at a
+    time. LatexOCR.__call__ is never used: it chdirs the whole process into
+    pix2tex's model directory. Returns one latex string (or None) per entry.
+    """
+    latex_ocr = latex_handle.model
+    start_time = time.time()
+    with latex_handle.lock:
+        try:
+            texts = recognize_batch(latex_ocr, [tensor for _, tensor in entries])
+        except Exception as e:
+            print(f"Batched OCR failed for {len(entries)} crops ({e}), falling back to single crops")
+            texts = []
+            for item_id, tensor in entries:
+                try:
+                    texts.append(recognize_batch(latex_ocr, [tensor])[0])
+                except Exception as single_error:
+                    print(f"Error running OCR on crop {item_id}: {single_error}")
+                    texts.append(None)
+    elapsed = time.time() - start_time
+    height, width = entries[0][1].shape[-2:]
+    print(f"[INFO] LatexOCR batch of {len(entries)} crop(s) at {width}x{height} took "
+          f"{elapsed:.3f} seconds ({elapsed / len(entries):.3f} s/crop)")
+    return texts
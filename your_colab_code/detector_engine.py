@@ -0,0 +1,257 @@
+import os
+import argparse
+import logging
+
+import numpy as np
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# 'darknet' runs yolov8.cfg/yolov8.weights on OpenCV's default backend;
+# 'openvino' (OpenCV's Inference Engine backend) and 'onnxruntime' run the
+# ONNX export of the same network
+DETECTOR_BACKEND = os.getenv('DETECTOR_BACKEND', 'darknet')
+DETECTOR_ONNX_PATH = os.getenv('DETECTOR_ONNX_PATH', '')
+DETECTOR_INT8 = os.getenv('DETECTOR_INT8', '0') == '1'
+DETECTOR_THREADS = int(os.getenv('DETECTOR_THREADS', '0'))
+YOLO_INPUT_SIZE = int(os.getenv('YOLO_INPUT_SIZE', '416'))
+
+BACKENDS = ('darknet', 'openvino', 'onnxruntime')
+
+
+def onnx_model_path(yolo_path, int8=False):
+    """Path of the exported ONNX detector; the INT8 variant sits next to it as *.int8.onnx."""
+    path = DETECTOR_ONNX_PATH or os.path.join(yolo_path, 'yolov8.onnx')
+    if int8:
+        root, ext = os.path.splitext(path)
+        path = f"{root}.int8{ext}"
+    return path
+
+
+def make_blob(images, input_size):
+    """NCHW float32 batch in the layout the Darknet network was trained on."""
+    return cv2.dnn.blobFromImages(images, 1 / 255.0, (input_size, input_size), swapRB=True, crop=False)
+
+
+def split_batch_outputs(layer_outputs, batch_len):
+    """Split batched YOLO layer outputs into a per-page list of layer outputs.
+
+    OpenCV returns (rows, 5 + classes) for a single image and either
+    (batch, rows, 5 + classes) or the batch stacked along rows for larger
+    batches; both are reshaped to one (rows, 5 + classes) array per page.
+    """
+    per_layer = [output.reshape(batch_len, -1, output.shape[-1]) for output in layer_outputs]
+    return [[layer[i] for layer in per_layer] for i in range(batch_len)]
+
+
+def onnx_to_darknet_rows(outputs, batch_len):
+    """Bring ONNX detector outputs to the Darknet layout decode_yolo_outputs expects.
+
+    Two export layouts are understood: Darknet-style rows (batch, N,
+    5 + classes) of (cx, cy, w, h, objectness, class scores), and the
+    boxes/confidences pair written by darknet2onnx-style exporters,
+    (batch, N, 1, 4) corner boxes plus (batch, N, classes) scores.
+    """
+    if len(outputs) == 2:
+        boxes, scores = outputs if outputs[0].shape[-1] == 4 else outputs[::-1]
+        boxes = boxes.reshape(batch_len, -1, 4)
+        scores = scores.reshape(batch_len, boxes.shape[1], -1)
+        rows = np.empty((batch_len, boxes.shape[1], 5 + scores.shape[-1]), dtype=np.float32)
+        rows[..., 0] = (boxes[..., 0] + boxes[..., 2]) / 2
+        rows[..., 1] = (boxes[..., 1] + boxes[..., 3]) / 2
+        rows[..., 2] = boxes[..., 2] - boxes[..., 0]
+        rows[..., 3] = boxes[..., 3] - boxes[..., 1]
+        rows[..., 4] = scores.max(axis=-1)
+        rows[..., 5:] = scores
+        return [[page] for page in rows]
+    if all(output.shape[-1] > 5 for output in outputs):
+        return split_batch_outputs(outputs, batch_len)
+    shapes = ', '.join(str(output.shape) for output in outputs)
+    raise ValueError(f"Unsupported ONNX detector outputs {shapes}; expected (batch, N, 5 + classes) rows "
+                     f"or (batch, N, 1, 4) boxes with (batch, N, classes) scores")
+
+
+class DetectorEngine:
+    """Runs the layout detector and returns raw YOLO rows for detect_objects().
+
+    `forward(images)` takes BGR pages and returns, per page, a list of
+    (rows, 5 + classes) arrays in coordinates relative to the page.
+    """
+
+    name = None
+    # Whether forward() may be called from several threads at once
+    thread_safe = False
+    int8 = False
+
+    def __init__(self, input_size):
+        if input_size % 32:
+            raise ValueError(f"YOLO input size must be a multiple of 32, got {input_size}")
+        self.input_size = input_size
+
+    def forward(self, images):
+        return self._forward(make_blob(images, self.input_size), len(images))
+
+    def _forward(self, blob, batch_len):
+        raise NotImplementedError
+
+
+class DarknetEngine(DetectorEngine):
+    """The original cfg/weights on OpenCV's default DNN backend."""
+
+    name = 'darknet'
+
+    def __init__(self, config_path, weights_path, input_size=YOLO_INPUT_SIZE):
+        super().__init__(input_size)
+        self.net = cv2.dnn.readNetFromDarknet(config_path, weights_path)
+        layer_names = self.net.getLayerNames()
+        self.output_layer_names = [layer_names[i - 1] for i in np.asarray(self.net.getUnconnectedOutLayers()).flatten()]
+
+    def _forward(self, blob, batch_len):
+        self.net.setInput(blob)
+        return split_batch_outputs(self.net.forward(self.output_layer_names), batch_len)
+
+
+class OpenVinoEngine(DetectorEngine):
+    """The ONNX export on OpenCV's OpenVINO (Inference Engine) backend."""
+
+    name = 'openvino'
+
+    def __init__(self, onnx_path, input_size=YOLO_INPUT_SIZE):
+        super().__init__(input_size)
+        self.net = cv2.dnn.readNetFromONNX(onnx_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.output_names = self.net.getUnconnectedOutLayersNames()
+
+    def _forward(self, blob, batch_len):
+        self.net.setInput(blob)
+        return onnx_to_darknet_rows(self.net.forward(self.output_names), batch_len)
+
+
+class OnnxRuntimeEngine(DetectorEngine):
+    """The ONNX export (FP32 or INT8) on ONNX Runtime's CPU provider."""
+
+    name = 'onnxruntime'
+    thread_safe = True
+
+    def __init__(self, onnx_path, input_size=YOLO_INPUT_SIZE, threads=DETECTOR_THREADS):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+
+        # Exports with a fixed input shape dictate the size and batch
+        batch_dim, _, height_dim, _ = model_input.shape
+        if isinstance(height_dim, int) and height_dim != input_size:
+            logger.warning(f"{onnx_path} was exported for {height_dim}x{height_dim} input; "
+                           f"using that instead of {input_size}")
+            input_size = height_dim
+        self.fixed_batch = batch_dim if isinstance(batch_dim, int) else None
+        super().__init__(input_size)
+
+    def _forward(self, blob, batch_len):
+        if self.fixed_batch == 1 and batch_len > 1:
+            pages = []
+            for i in range(batch_len):
+                pages.extend(self._forward(blob[i:i + 1], 1))
+            return pages
+        return onnx_to_darknet_rows(self.session.run(None, {self.input_name: blob}), batch_len)
+
+
+def create_engine(yolo_path, backend=None, int8=None, input_size=None):
+    """Build the detector engine selected by DETECTOR_BACKEND/DETECTOR_INT8/YOLO_INPUT_SIZE."""
+    backend = backend or DETECTOR_BACKEND
+    int8 = DETECTOR_INT8 if int8 is None else int8
+    input_size = input_size or YOLO_INPUT_SIZE
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown DETECTOR_BACKEND '{backend}'; choose one of {', '.join(BACKENDS)}")
+
+    if backend == 'darknet':
+        if int8:
+            raise ValueError("The INT8 detector is an ONNX model; use DETECTOR_BACKEND=onnxruntime or openvino")
+        config_path = os.path.join(yolo_path, "yolov8.cfg")
+        weights_path = os.path.join(yolo_path, "yolov8.weights")
+        if not os.path.exists(weights_path):
+            raise FileNotFoundError(f"YOLO weights file not found: {weights_path}")
+        if not os.path.exists(config_path):
+            raise FileNotFoundError(f"YOLO config file not found: {config_path}")
+        return DarknetEngine(config_path, weights_path, input_size)
+
+    onnx_path = onnx_model_path(yolo_path, int8)
+    if not os.path.exists(onnx_path):
+        raise FileNotFoundError(f"ONNX detector not found: {onnx_path}")
+    engine_class = OpenVinoEngine if backend == 'openvino' else OnnxRuntimeEngine
+    engine = engine_class(onnx_path, input_size)
+    engine.int8 = int8
+    return engine
+
+
+def engine_settings(yolo_path):
+    """What the configured engine would run, for cache versioning (nothing is loaded)."""
+    settings = f"{DETECTOR_BACKEND}-{YOLO_INPUT_SIZE}"
+    if DETECTOR_BACKEND != 'darknet':
+        onnx_path = onnx_model_path(yolo_path, DETECTOR_INT8)
+        size = os.path.getsize(onnx_path) if os.path.exists(onnx_path) else 0
+        settings += f"-{'int8' if DETECTOR_INT8 else 'fp32'}-{size}"
+    return settings
+
+
+class _PageCalibrationReader:
+    """Feeds rendered pages to ONNX Runtime's static quantizer one blob at a time."""
+
+    def __init__(self, input_name, blobs):
+        self.input_name = input_name
+        self.blobs = iter(blobs)
+
+    def get_next(self):
+        blob = next(self.blobs, None)
+        return None if blob is None else {self.input_name: blob}
+
+
+def quantize_int8(onnx_path, output_path, calibration_images, input_size=YOLO_INPUT_SIZE):
+    """Write a static INT8 (QDQ) copy of `onnx_path`, calibrated on real page renders."""
+    import onnxruntime as ort
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType
+
+    input_name = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    reader = _PageCalibrationReader(input_name, (make_blob([image], input_size) for image in calibration_images))
+    quantize_static(onnx_path, output_path, reader, quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+    return output_path
+
+
+def _calibration_pages(pdf_paths, limit, dpi=90):
+    from your_colab_code.page_source import PdfPageSource
+
+    count = 0
+    for pdf_path in pdf_paths:
+        for _, pil_image in PdfPageSource(pdf_path, dpi=dpi):
+            if count >= limit:
+                return
+            yield cv2.cvtColor(np.asarray(pil_image.convert('RGB')), cv2.COLOR_RGB2BGR)
+            count += 1
+
+
+def main():
+    from your_colab_code.model_registry import get_yolo_path
+
+    parser = argparse.ArgumentParser(description="Build the INT8 layout detector from the ONNX export.")
+    parser.add_argument('pdfs', nargs='+', help='representative PDFs whose pages calibrate the quantizer')
+    parser.add_argument('--pages', type=int, default=64, help='calibration pages to use')
+    parser.add_argument('--input-size', type=int, default=YOLO_INPUT_SIZE)
+    args = parser.parse_args()
+
+    yolo_path = get_yolo_path()
+    source = onnx_model_path(yolo_path)
+    target = onnx_model_path(yolo_path, int8=True)
+    quantize_int8(source, target, _calibration_pages(args.pdfs, args.pages), args.input_size)
+    print(f"Wrote {target}; run with DETECTOR_BACKEND=onnxruntime DETECTOR_INT8=1")
+
+
+if __name__ == '__main__':
+    main()
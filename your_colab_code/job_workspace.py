@@ -0,0 +1,47 @@
+import os
+import re
+import uuid
+
+JOBS_ROOT = os.path.join('static', 'jobs')
+
+_JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class JobWorkspace:
+    """Private directory tree and crop manifest for a single processing job.
+
+    Every artifact a job writes (annotated pages, crops, audio) lives under
+    static/jobs/<job_id>/, and the downstream stages work from the in-memory
+    manifest instead of listing shared folders, so jobs never pick up each
+    other's files.
+    """
+
+    def __init__(self, job_id=None, root=JOBS_ROOT):
+        self.job_id = job_id or uuid.uuid4().hex
+        if not _JOB_ID_PATTERN.match(self.job_id):
+            raise ValueError(f"Invalid job id: {self.job_id!r}")
+        self.root = os.path.join(root, self.job_id)
+        self.segments = []
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, *parts):
+        """Return a directory inside the workspace, creating it if needed."""
+        directory = os.path.join(self.root, *parts)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def crop_dir(self, class_name):
+        return self.path('cropped_images', class_name)
+
+    def add_segment(self, path, class_name, page, box, confidence):
+        """Record a crop written by the detector and return its manifest entry."""
+        segment = {
+            'index': len(self.segments),
+            'path': path,
+            'class_name': class_name,
+            'page': page,
+            'box': tuple(int(v) for v in box),
+            'confidence': float(confidence),
+        }
+        self.segments.append(segment)
+        return segment
@@ -0,0 +1,128 @@
+import os
+import re
+import json
+import time
+
+from rate_limit import call_with_retries
+from tracing import span
+
+GROQ_BATCH_SIZE = int(os.getenv('GROQ_BATCH_SIZE', '20'))
+GROQ_BATCH_TOKEN_BUDGET = int(os.getenv('GROQ_BATCH_TOKEN_BUDGET', '3000'))
+
+BATCH_PROMPT = (
+    "Convert each of the following plain text segments, extracted from a school "
+    "textbook page by OCR, to readable English that can be read aloud.\n"
+    "Respond with a JSON object of the form "
+    '{"results": [{"id": <segment id>, "english": "<readable English>"}]} '
+    "containing exactly one entry for every input id and nothing else.\n\n"
+    "Segments:\n"
+)
+
+
+class BatchParseError(ValueError):
+    """The model's answer for a batch could not be mapped back to its segments."""
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def make_batches(items, batch_size=None, token_budget=None):
+    """Greedily pack (id, text) items into batches bounded by count and tokens."""
+    batch_size = max(1, batch_size or GROQ_BATCH_SIZE)
+    token_budget = token_budget or GROQ_BATCH_TOKEN_BUDGET
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for item_id, text in items:
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > token_budget):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append((item_id, text))
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def convert_single(groq_client, text, model):
+    """Convert one segment with the original free-text prompt."""
+    with span('groq', segments=1):
+        completion = call_with_retries(lambda: groq_client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "user",
+                 "content": f"Convert the following plain text content to readable English:\n\n{text}"},
+            ],
+            stop="```",
+        ))
+    response_text = completion.choices[0].message.content
+    match = re.search(r'"(.*?)"', response_text)
+    return match.group(1) if match else response_text.strip()
+
+
+def convert_batch(groq_client, batch, model):
+    """Convert a batch of (id, text) segments with one JSON-mode completion."""
+    segments = [{"id": item_id, "text": text} for item_id, text in batch]
+    with span('groq', segments=len(batch)):
+        completion = call_with_retries(lambda: groq_client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "user", "content": BATCH_PROMPT + json.dumps(segments, ensure_ascii=False)},
+            ],
+            response_format={"type": "json_object"},
+        ))
+    response_text = completion.choices[0].message.content
+
+    try:
+        results = json.loads(response_text)["results"]
+        converted = {int(entry["id"]): str(entry["english"]).strip() for entry in results}
+    except (ValueError, KeyError, TypeError) as e:
+        raise BatchParseError(f"Unparseable batch response: {e}") from e
+
+    missing = [item_id for item_id, _ in batch if item_id not in converted]
+    if missing:
+        raise BatchParseError(f"Batch response is missing segment ids {missing}")
+    return {item_id: converted[item_id] for item_id, _ in batch}
+
+
+def _convert_with_fallback(groq_client, batch, model):
+    try:
+        return convert_batch(groq_client, batch, model)
+    except BatchParseError as e:
+        if len(batch) == 1:
+            print(f"Batch conversion failed for segment {batch[0][0]} ({e}), using single prompt")
+            item_id, text = batch[0]
+            return {item_id: convert_single(groq_client, text, model)}
+        print(f"Batch of {len(batch)} segments failed to parse ({e}), splitting")
+        middle = len(batch) // 2
+        converted = _convert_with_fallback(groq_client, batch[:middle], model)
+        converted.update(_convert_with_fallback(groq_client, batch[middle:], model))
+        return converted
+
+
+def convert_segments(groq_client, items, model, batch_size=None, token_budget=None, on_batch=None):
+    """Convert many (integer id, plain text) segments to readable English.
+
+    Segments are packed into as few completions as the batch size and
+    token budget allow; a batch whose answer cannot be parsed is split in
+    half until it succeeds or falls back to one request per segment.
+    Returns {id: english}; ids whose batch failed outright are left out.
+    `on_batch(converted_so_far)` is called after every successful batch.
+    """
+    converted = {}
+    for batch in make_batches(items, batch_size, token_budget):
+        start_time = time.time()
+        try:
+            converted.update(_convert_with_fallback(groq_client, batch, model))
+        except Exception as e:
+            # Leave these ids out; the caller reports them as failed segments
+            print(f"Error converting batch of {len(batch)} segments: {e}")
+            continue
+        print(f"[INFO] Groq converted {len(batch)} segment(s) in {time.time() - start_time:.3f} seconds")
+        if on_batch:
+            on_batch(len(converted))
+    return converted
@@ -24,246 +24,350 @@ def run_structeqtable(image_path):
 
 import numpy as np
 import time
+import threading
 import cv2
 import os
 import uuid
-import re
-from pdf2image import convert_from_path
+from contextlib import nullcontext
 from PIL import Image
 from io import BytesIO
-from pix2tex.cli import LatexOCR
 from pylatexenc.latex2text import LatexNodes2Text
-from gtts import gTTS
 from groq import Groq
+from your_colab_code.model_registry import get_model, warm_up, yolo_fingerprint
+from your_colab_code.job_workspace import JobWorkspace
+from your_colab_code.yolo_postprocess import detect_objects
+from your_colab_code.page_source import PdfPageSource, render_region, scale_box
+from your_colab_code.llm_batch import convert_segments, GROQ_BATCH_SIZE
+from your_colab_code.batch_ocr import configure_torch_threads, preprocess, recognize_crops, OCR_BATCH_SIZE
+from your_colab_code.tts_cache import get_tts_cache
+from your_colab_code.tts_backends import get_tts_backend, TTS_BACKEND, TTS_WORKERS
+from your_colab_code.pipeline_engine import StagedPipeline, Stage
+from tracing import span, record_span
 
-def process_pdf(input_pdf):
-    """Process PDF file: extract images, detect objects, and generate audio."""
-    print("Processing PDF...")
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    yolo_path = os.getenv('YOLO_PATH', os.path.join(base_dir, 'segmentation', 'documents-segment-classification-main', 'yolo-coco'))
-    labels_path = os.path.join(yolo_path, "classes.names")
-    
-    if not os.path.exists(labels_path):
-        raise FileNotFoundError(f"YOLO labels file not found: {labels_path}")
-    
-    with open(labels_path, 'r') as f:
-        labels = f.read().strip().split("\n")
-    
-    np.random.seed(42)
-    colors = np.random.randint(0, 255, size=(len(labels), 3), dtype="uint8")
-    
-    weights_path = os.path.join(yolo_path, "yolov8.weights")
-    config_path = os.path.join(yolo_path, "yolov8.cfg")
+PIPELINE_VERSION = 'ml-1'
+GROQ_MODEL = "llama3-70b-8192"
+OCR_CLASSES = ('Equation', 'Text')
+YOLO_BATCH_SIZE = int(os.getenv('YOLO_BATCH_SIZE', '4'))
+# 'thread' shares one locked model per web process; 'process' gives the
+# detect and OCR stages long-lived worker processes, each loading its model once
+PIPELINE_CPU_EXECUTOR = os.getenv('PIPELINE_CPU_EXECUTOR', 'thread')
+PIPELINE_DETECT_WORKERS = int(os.getenv('PIPELINE_DETECT_WORKERS', '1'))
+PIPELINE_OCR_WORKERS = int(os.getenv('PIPELINE_OCR_WORKERS', '1'))
+DETECT_DPI = 90
+# Two-resolution mode: detect on the cheap DETECT_DPI render, then re-rasterize
+# only the OCR-class regions at OCR_CROP_DPI (0 crops from the detection render)
+OCR_CROP_DPI = int(os.getenv('OCR_CROP_DPI', '0'))
+OCR_CROP_MARGIN = int(os.getenv('OCR_CROP_MARGIN', '2'))
+OCR_RENDER_WORKERS = int(os.getenv('OCR_RENDER_WORKERS', '4'))
+
+def pil_to_bgr(pil_image):
+    """Convert a rendered PIL page straight to an OpenCV BGR array, without touching disk."""
+    if pil_image.mode != 'RGB':
+        pil_image = pil_image.convert('RGB')
+    rgb = np.asarray(pil_image)
+    if rgb.size == 0:
+        return None
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+def pipeline_version():
+    """Version string for cached results: pipeline code, detector files, LLM and TTS engine."""
+    version = f"{PIPELINE_VERSION}:yolo-{yolo_fingerprint()}:{GROQ_MODEL}:{TTS_BACKEND}"
+    if OCR_CROP_DPI > DETECT_DPI:
+        version += f":ocr-{OCR_CROP_DPI}dpi"
+    return version
+
+def _no_progress(stage=None, **counters):
+    pass
+
+def detect_pages(batch):
+    """Run one YOLO forward pass over (page_idx, image) pairs and decode each page's boxes.
+
+    Module-level so the detect stage can also run in a worker process,
+    which loaded its own copy of the network when the pool started.
+    Returns (page_idx, image, [(x, y, w, h, confidence, class_name, color)]).
+    """
+    yolo = get_model('yolo')
+    labels = yolo.model['labels']
+    colors = yolo.model['colors']
+    engine = yolo.model['engine']
+    # ONNX Runtime sessions take concurrent calls; cv2.dnn nets do not
+    lock = nullcontext() if engine.thread_safe else yolo.lock
     
-    if not os.path.exists(weights_path):
-        raise FileNotFoundError(f"YOLO weights file not found: {weights_path}")
-    if not os.path.exists(config_path):
-        raise FileNotFoundError(f"YOLO config file not found: {config_path}")
+    start_time = time.time()
+    with span('detect', page=batch[0][0], pages=len(batch), backend=engine.name), lock:
+        per_page_outputs = engine.forward([cv_image for _, cv_image in batch])
+    processing_time = time.time() - start_time
+    print(f"[INFO] YOLO batch of {len(batch)} page(s) took {processing_time:.6f} seconds "
+          f"({processing_time / len(batch):.6f} s/page)")
     
-    print("[INFO] Loading YOLO model from disk...")
-    net = cv2.dnn.readNetFromDarknet(config_path, weights_path)
+    detected = []
+    for (page_idx, cv_image), outputs in zip(batch, per_page_outputs):
+        height, width = cv_image.shape[:2]
+        boxes = [(x, y, w, h, confidence, labels[class_id], [int(c) for c in colors[class_id]])
+                 for x, y, w, h, confidence, class_id in detect_objects(outputs, width, height)]
+        detected.append((page_idx, cv_image, boxes))
+    return detected
 
-    base_output_folder = 'static/cropped_images'
-    os.makedirs(base_output_folder, exist_ok=True)
+def prepare_ocr(records):
+    """Build the LatexOCR encoder input of each segment record's crop.
 
-    def pdf2img_and_detect_objects(folder_name="segmentated_images"):
-        """Convert PDF to images and detect objects using YOLO."""
-        image_paths = []
-        output_dir = os.path.join("static", folder_name)
-        os.makedirs(output_dir, exist_ok=True)
-        
+    Module-level for the same reason as detect_pages. Sets 'tensor' and
+    its 'ocr_shape' (both None where the crop could not be read), so the
+    OCR stage can batch crops of the same shape from any page.
+    """
+    configure_torch_threads()
+    latex_handle = get_model('latex_ocr')
+    for record in records:
+        record['tensor'] = None
+        record['ocr_shape'] = None
         try:
-            if not os.path.exists(input_pdf):
-                raise FileNotFoundError(f"PDF file not found: {input_pdf}")
-            
-            images = convert_from_path(input_pdf, dpi=90)
-            
-            layer_names = net.getLayerNames()
-            output_layers = net.getUnconnectedOutLayers()
-            output_layer_names = [layer_names[i - 1] for i in output_layers]
-            
-            for page_idx, pil_image in enumerate(images):
-                temp_filename = f'image_{page_idx}.png'
-                pil_image.save(temp_filename, "PNG")
-                
-                cv_image = cv2.imread(temp_filename)
-                if cv_image is None:
-                    print(f"Warning: Failed to load image {temp_filename}")
-                    continue
-                
-                height, width = cv_image.shape[:2]
-                
-                blob = cv2.dnn.blobFromImage(cv_image, 1 / 255.0, (416, 416), swapRB=True, crop=False)
-                net.setInput(blob)
-                
-                start_time = time.time()
-                layer_outputs = net.forward(output_layer_names)
-                processing_time = time.time() - start_time
-                print(f"[INFO] YOLO processing took {processing_time:.6f} seconds")
-                
-                boxes = []
-                confidences = []
-                class_ids = []
-                
-                for output in layer_outputs:
-                    for detection in output:
-                        scores = detection[5:]
-                        class_id = np.argmax(scores)
-                        confidence = scores[class_id]
-                        
-                        if confidence > 0.05:
-                            box = detection[0:4] * np.array([width, height, width, height])
-                            center_x, center_y, box_width, box_height = box.astype("int")
-                            x = int(center_x - (box_width / 2))
-                            y = int(center_y - (box_height / 2))
-                            
-                            boxes.append([x, y, int(box_width), int(box_height)])
-                            confidences.append(float(confidence))
-                            class_ids.append(class_id)
-                
-                if len(boxes) > 0:
-                    indices = cv2.dnn.NMSBoxes(boxes, confidences, score_threshold=0.5, nms_threshold=0.3)
-                    
-                    if len(indices) > 0:
-                        for idx in indices.flatten():
-                            x, y, w, h = boxes[idx]
-                            class_id = class_ids[idx]
-                            confidence = confidences[idx]
-                            class_name = labels[class_id]
-                            
-                            class_folder = os.path.join(base_output_folder, class_name)
-                            os.makedirs(class_folder, exist_ok=True)
-                            
-                            x_end = min(x + w, width)
-                            y_end = min(y + h, height)
-                            x = max(x, 0)
-                            y = max(y, 0)
-                            
-                            cropped_img = cv_image[y:y_end, x:x_end]
-                            
-                            if cropped_img.size > 0:
-                                crop_filename = os.path.join(
-                                    class_folder, 
-                                    f"{class_name}_cropped_{page_idx}_{temp_filename}"
-                                )
-                                cv2.imwrite(crop_filename, cropped_img)
-                                print(f"Saved cropped {class_name} image: {crop_filename}")
-                            
-                            color = [int(c) for c in colors[class_id]]
-                            cv2.rectangle(cv_image, (x, y), (x + w, y + h), color, 2)
-                            label_text = f"{class_name}: {confidence:.4f}"
-                            cv2.putText(cv_image, label_text, (x, y - 5), 
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                
-                resized_image = cv2.resize(cv_image, (960, 520))
-                output_filename = f"output_image_{uuid.uuid4().hex[:6]}.jpg"
-                output_path = os.path.join(output_dir, output_filename)
-                cv2.imwrite(output_path, resized_image)
-                image_paths.append(output_path)
-                
-                if os.path.exists(temp_filename):
-                    os.remove(temp_filename)
-            
-            print("Processing completed successfully!")
-            
+            with Image.open(record['path']) as img:
+                img.load()
+                with latex_handle.lock:
+                    tensor = preprocess(latex_handle.model, img)
         except Exception as e:
-            print(f"Error during PDF processing: {e}")
-            raise
+            print(f"Error processing {os.path.basename(record['path'])}: {e}")
+            continue
+        record['tensor'] = tensor
+        record['ocr_shape'] = tuple(tensor.shape[-2:])
+    return records
+
+def ocr_segments(records):
+    """LaTeX OCR and plain-text conversion for segment records of one encoder shape.
+
+    Module-level for the same reason as detect_pages. Every record comes
+    back with 'prediction' and 'plain_text' set (None where OCR failed)
+    and its tensor dropped.
+    """
+    configure_torch_threads()
+    ready = [record for record in records if record['tensor'] is not None]
+    predictions = {}
+    if ready:
+        with span('ocr', page=records[0]['page'], crops=len(ready)):
+            texts = recognize_crops(get_model('latex_ocr'), [(record['index'], record['tensor']) for record in ready])
+        predictions = {record['index']: text for record, text in zip(ready, texts)}
+    
+    for record in records:
+        del record['tensor']
+        record['prediction'] = None
+        record['plain_text'] = None
+        prediction = predictions.get(record['index'])
+        image_file = os.path.basename(record['path'])
+        if not isinstance(prediction, str):
+            print(f"Error: Invalid prediction for {image_file}")
+            continue
+        
+        record['prediction'] = prediction
+        print(f"Predicted LaTeX for {image_file}: {prediction}")
         
-        return image_paths
-    image_paths = pdf2img_and_detect_objects()
+        try:
+            record['plain_text'] = LatexNodes2Text().latex_to_text(prediction)
+            print(f"Plain text for {image_file}: {record['plain_text']}")
+        except Exception as e:
+            print(f"Error processing {image_file}: {e}")
+    return records
+
+def process_pdf(input_pdf, job_id=None, progress=None, pages=None, ocr_classes=None):
+    """Process PDF file: extract images, detect objects, and generate audio.
+
+    Pages stream through a StagedPipeline (render -> detect -> crop -> OCR
+    -> Groq -> TTS), so the first page's segments are being read and voiced
+    while later pages are still being detected. `progress(stage=None,
+    **counters)` receives page/segment counters and per-stage queue stats.
+    `pages` (1-based page numbers) limits which pages are rendered at all,
+    and only crops of `ocr_classes` (default OCR_CLASSES) are OCR'd,
+    converted and voiced. With OCR_CROP_DPI set, those crops are
+    re-rasterized from the PDF at that resolution before OCR.
+    """
+    print("Processing PDF...")
+    report = progress or _no_progress
+    ocr_classes = tuple(ocr_classes or OCR_CLASSES)
+    workspace = JobWorkspace(job_id)
     
     groq_api_key = os.getenv("GROQ_API_KEY")
     if not groq_api_key:
         raise ValueError("GROQ_API_KEY environment variable is not set. Please set it before running the application.")
+    groq_client = Groq(api_key=groq_api_key)
+    tts_backend = get_tts_backend(lang='en')
+    tts_cache = get_tts_cache()
     
-    latex_model = LatexOCR()
-
-    def process_image_folder(folder_path, groq_client):
-        """Process images in a folder and return results."""
-        extracted_texts = []
-        audio_paths = []
-        predictions = []
-        image_paths_list = []
-        
-        if not os.path.isdir(folder_path):
-            print(f"Warning: Folder path does not exist: {folder_path}")
-            return extracted_texts, audio_paths, predictions, image_paths_list
-        
-        image_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
-        image_files = [f for f in os.listdir(folder_path) 
-                      if f.lower().endswith(image_extensions)]
-        
-        if not image_files:
-            print(f"No image files found in: {folder_path}")
-            return extracted_texts, audio_paths, predictions, image_paths_list
-        
-        for image_file in image_files:
-            image_path = os.path.join(folder_path, image_file)
-            image_paths_list.append(image_path)
+    output_dir = workspace.path("segmentated_images")
+    page_images = {}
+    counts = {'pages_rendered': 0, 'crops_detected': 0, 'ocr_total': 0, 'llm_done': 0, 'audio_done': 0}
+    counts_lock = threading.Lock()
+    
+    def count(**increments):
+        with counts_lock:
+            for key, value in increments.items():
+                counts[key] += value
+            snapshot = dict(counts)
+        report(**snapshot)
+    
+    def render_pages():
+        """Rasterize the PDF lazily and hand each page on as a BGR array."""
+        # pdftoppm's raw PPM output is parsed in memory by pdf2image,
+        # a chunk of pages at a time
+        source = PdfPageSource(input_pdf, dpi=DETECT_DPI, pages=pages)
+        report('detect', pages_total=len(source), **counts)
+        start_time = time.perf_counter()
+        for page_idx, pil_image in source:
+            cv_image = pil_to_bgr(pil_image)
+            record_span('render', time.perf_counter() - start_time, page=page_idx)
+            if cv_image is None:
+                print(f"Warning: Failed to convert page {page_idx}")
+                continue
+            yield page_idx, cv_image
+            start_time = time.perf_counter()
+    
+    def annotate_pages(detected):
+        """Save each page's crops and annotated image; pass OCR-class crops on."""
+        segments = []
+        crops_before = len(workspace.segments)
+        for page_idx, cv_image, boxes in detected:
+            page_start = time.perf_counter()
+            height, width = cv_image.shape[:2]
             
-            try:
-                img = Image.open(image_path)
-                prediction = latex_model(img)
-                
-                if not isinstance(prediction, str):
-                    print(f"Error: Invalid prediction for {image_file}")
-                    audio_paths.append("ERROR in Prediction")
-                    extracted_texts.append("ERROR in Prediction")
-                    predictions.append("ERROR in Prediction")
-                    continue
-                
-                predictions.append(prediction)
-                print(f"Predicted LaTeX for {image_file}: {prediction}")
+            for x, y, w, h, confidence, class_name, color in boxes:
+                class_folder = workspace.crop_dir(class_name)
                 
-                plain_text = LatexNodes2Text().latex_to_text(prediction)
-                print(f"Plain text for {image_file}: {plain_text}")
+                x_end = min(x + w, width)
+                y_end = min(y + h, height)
+                x = max(x, 0)
+                y = max(y, 0)
                 
-                completion = groq_client.chat.completions.create(
-                    model="llama3-70b-8192",
-                    messages=[
-                        {"role": "user", 
-                         "content": f"Convert the following plain text content to readable English:\n\n{plain_text}"},
-                    ],
-                    stop="```",
-                )
+                cropped_img = cv_image[y:y_end, x:x_end]
                 
-                response_text = completion.choices[0].message.content
-                match = re.search(r'"(.*?)"', response_text)
-                extracted_text = match.group(1) if match else response_text.strip()
-                print(f"English text: {extracted_text}")
+                if cropped_img.size > 0:
+                    crop_filename = os.path.join(
+                        class_folder, 
+                        f"{class_name}_cropped_{page_idx}_{len(workspace.segments)}.png"
+                    )
+                    cv2.imwrite(crop_filename, cropped_img)
+                    segment = workspace.add_segment(crop_filename, class_name, page_idx,
+                                                    (x, y, x_end - x, y_end - y), confidence)
+                    print(f"Saved cropped {class_name} image: {crop_filename}")
+                    if class_name in ocr_classes:
+                        segments.append(dict(segment))
                 
-                output_dir = os.path.join("static", "outputs")
-                os.makedirs(output_dir, exist_ok=True)
-                
-                audio_filename = f"audio_{uuid.uuid4().hex[:6]}.mp3"
-                audio_path = os.path.join(output_dir, audio_filename)
-                
-                tts = gTTS(text=extracted_text, lang='en')
-                tts.save(audio_path)
-                
-                audio_paths.append(audio_path)
-                extracted_texts.append(extracted_text)
-                
-            except Exception as e:
-                print(f"Error processing {image_file}: {e}")
-                audio_paths.append("ERROR in Prediction")
-                extracted_texts.append("ERROR in Prediction")
-                predictions.append("ERROR in Prediction")
+                cv2.rectangle(cv_image, (x, y), (x + w, y + h), color, 2)
+                label_text = f"{class_name}: {confidence:.4f}"
+                cv2.putText(cv_image, label_text, (x, y - 5), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            
+            resized_image = cv2.resize(cv_image, (960, 520))
+            output_filename = f"output_image_{uuid.uuid4().hex[:6]}.jpg"
+            output_path = os.path.join(output_dir, output_filename)
+            cv2.imwrite(output_path, resized_image)
+            page_images[page_idx] = output_path
+            report(event={'type': 'page', 'page': page_idx + 1, 'image_url': output_path})
+            record_span('crop_write', time.perf_counter() - page_start, page=page_idx, crops=len(boxes))
         
-        return extracted_texts, audio_paths, predictions, image_paths_list
+        count(pages_rendered=len(detected), crops_detected=len(workspace.segments) - crops_before,
+              ocr_total=len(segments))
+        return segments
     
-    groq_client = Groq(api_key=groq_api_key)
+    def rerender_crops(records):
+        """Replace detection-resolution crops with OCR_CROP_DPI renders of the same regions."""
+        for record in records:
+            region = scale_box(record['box'], DETECT_DPI, OCR_CROP_DPI, margin=OCR_CROP_MARGIN)
+            try:
+                with span('crop_render', page=record['page'], dpi=OCR_CROP_DPI):
+                    render_region(input_pdf, record['page'] + 1, region, OCR_CROP_DPI, record['path'])
+            except Exception as e:
+                # The detection-resolution crop is still on disk; OCR that instead
+                print(f"Error re-rendering {os.path.basename(record['path'])} at {OCR_CROP_DPI} DPI: {e}")
+        return records
+    
+    def convert_records(records):
+        """Readable English for many segments per Groq completion."""
+        items = [(record['index'], record['plain_text']) for record in records if record['plain_text'] is not None]
+        english_texts = convert_segments(groq_client, items, GROQ_MODEL) if items else {}
+        for record in records:
+            record['english'] = english_texts.get(record['index'])
+        count(llm_done=len(english_texts))
+        return records
+    
+    def voice_records(records):
+        """Speech for converted segments, shared across jobs through the TTS cache."""
+        converted = [record for record in records if record['english'] is not None]
+        clips = tts_cache.synthesize_many(
+            [record['english'] for record in converted], lang=tts_backend.lang, engine=tts_backend.name,
+            voice=tts_backend.voice, synthesize=tts_backend.synthesize, extension=tts_backend.extension,
+            workers=TTS_WORKERS)
+        for record in records:
+            record['audio'] = None
+        for record, clip in zip(converted, clips):
+            record['audio'] = clip
+        count(audio_done=len(converted))
+        for record in records:
+            # Stream the finished segment to the result page right away
+            report(event={
+                'type': 'segment',
+                'order': [ocr_classes.index(record['class_name']), record['index']],
+                'class_name': record['class_name'],
+                'page': record['page'] + 1,
+                'image_url': record['path'],
+                'latex': record['prediction'] or "ERROR in Prediction",
+                'text': record['english'] if record['audio'] is not None else "ERROR in Prediction",
+                'audio_url': record['audio'] or "ERROR in Prediction",
+            })
+        return records
+    
+    def on_stats(stats):
+        # Detection is the long pole the loading page shows first; once the
+        # last page is through, the job is about reading and voicing segments
+        report('ocr' if stats['detect']['done'] else None, ocr_done=stats['ocr']['processed'], stages=stats)
+    
+    stages = [
+        Stage('detect', detect_pages, workers=PIPELINE_DETECT_WORKERS, batch_size=YOLO_BATCH_SIZE,
+              executor=PIPELINE_CPU_EXECUTOR, initializer=warm_up, initargs=(['yolo'],)),
+        Stage('crop', annotate_pages, batch_size=YOLO_BATCH_SIZE),
+    ]
+    if OCR_CROP_DPI > DETECT_DPI:
+        # Each region is its own pdftoppm process, so run several at once
+        stages.append(Stage('crop_render', rerender_crops, workers=OCR_RENDER_WORKERS))
+    # Crops wait in the OCR stage until OCR_BATCH_SIZE of them share an
+    # encoder shape; odd shapes are only recognized once detection ends
+    stages += [
+        Stage('ocr_prep', prepare_ocr, workers=PIPELINE_OCR_WORKERS, batch_size=OCR_BATCH_SIZE,
+              executor=PIPELINE_CPU_EXECUTOR, pool='latex_ocr', initializer=warm_up, initargs=(['latex_ocr'],)),
+        Stage('ocr', ocr_segments, workers=PIPELINE_OCR_WORKERS, batch_size=OCR_BATCH_SIZE,
+              executor=PIPELINE_CPU_EXECUTOR, batch_key=lambda record: record['ocr_shape'],
+              pool='latex_ocr', initializer=warm_up, initargs=(['latex_ocr'],)),
+        Stage('llm', convert_records, batch_size=GROQ_BATCH_SIZE),
+        Stage('tts', voice_records, batch_size=TTS_WORKERS),
+    ]
+    pipeline = StagedPipeline(stages, on_stats=on_stats)
     
-    equation_folder = "static/cropped_images/Equation"
-    text_folder = "static/cropped_images/Text"
+    try:
+        records = pipeline.run(render_pages())
+        print("Processing completed successfully!")
+        for name, stats in pipeline.stats().items():
+            print(f"[INFO] Stage {name}: {stats['processed']} item(s) on {stats['workers']} "
+                  f"{stats['executor']} worker(s), busy {stats['busy_seconds']:.3f} seconds, "
+                  f"{stats['items_per_second']:.2f} items/s")
+    except Exception as e:
+        print(f"Error during PDF processing: {e}")
+        raise
     
-    eq_texts, eq_audio, eq_predictions, eq_images = process_image_folder(equation_folder, groq_client)
-    txt_texts, txt_audio, txt_predictions, txt_images = process_image_folder(text_folder, groq_client)
+    # Same order as before the pipeline: all equations, then all text, each
+    # in detection order
+    records.sort(key=lambda record: (ocr_classes.index(record['class_name']), record['index']))
+    image_paths = [page_images[page_idx] for page_idx in sorted(page_images)]
     
-    extracted_texts = eq_texts + txt_texts
-    audio_paths = eq_audio + txt_audio
-    predictions = eq_predictions + txt_predictions
-    images1 = eq_images + txt_images
+    predictions = []
+    extracted_texts = []
+    audio_paths = []
+    images1 = []
+    for record in records:
+        images1.append(record['path'])
+        predictions.append(record['prediction'] or "ERROR in Prediction")
+        if record['audio'] is None:
+            audio_paths.append("ERROR in Prediction")
+            extracted_texts.append("ERROR in Prediction")
+            continue
+        print(f"English text: {record['english']}")
+        audio_paths.append(record['audio'])
+        extracted_texts.append(record['english'])
     
-    return image_paths, predictions, extracted_texts, audio_paths, images1
\ No newline at end of file
+    return image_paths, predictions, extracted_texts, audio_paths, images1
@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+import logging
+import hashlib
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _current_rss_bytes():
+    """Return the resident set size of this process in bytes (0 if unknown)."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+            # ru_maxrss is reported in kilobytes on Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except Exception:
+            return 0
+
+
+def process_memory():
+    """RSS of this process in MB, split into pages shared with other processes and private ones.
+
+    Gunicorn workers forked from a preloaded master share the model weights
+    copy-on-write, so their RSS overstates what each one costs; the private
+    figure (and PSS, which charges shared pages pro rata) does not.
+    """
+    memory = {'rss_mb': round(_current_rss_bytes() / (1024 * 1024), 1)}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            # First line is the address-range header
+            fields = dict(line.split(':', 1) for line in f.readlines()[1:])
+    except OSError:
+        return memory
+
+    def field_mb(name):
+        return int(fields.get(name, '0 kB').split()[0]) / 1024
+
+    memory['pss_mb'] = round(field_mb('Pss'), 1)
+    memory['private_mb'] = round(field_mb('Private_Clean') + field_mb('Private_Dirty'), 1)
+    memory['shared_mb'] = round(field_mb('Shared_Clean') + field_mb('Shared_Dirty'), 1)
+    return memory
+
+
+class ModelHandle:
+    """A loaded model plus the lock that serializes inference on it."""
+
+    def __init__(self, name, model, load_seconds, rss_delta_bytes):
+        self.name = name
+        self.model = model
+        self.load_seconds = load_seconds
+        self.rss_delta_bytes = rss_delta_bytes
+        self.loaded_at = time.time()
+        # cv2.dnn.Net and LatexOCR keep per-call state, so concurrent
+        # requests must take turns on the shared instance.
+        self.lock = threading.Lock()
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'load_seconds': round(self.load_seconds, 3),
+            'rss_delta_mb': round(self.rss_delta_bytes / (1024 * 1024), 1),
+            'loaded_at': self.loaded_at,
+        }
+
+
+_loaders = {}
+_handles = {}
+_registry_lock = threading.Lock()
+
+
+def register_loader(name, loader):
+    """Register a zero-argument callable that builds the model called `name`."""
+    _loaders[name] = loader
+
+
+def get_model(name):
+    """Return the shared ModelHandle for `name`, loading it on first use."""
+    handle = _handles.get(name)
+    if handle is not None:
+        return handle
+
+    with _registry_lock:
+        handle = _handles.get(name)
+        if handle is not None:
+            return handle
+
+        if name not in _loaders:
+            raise KeyError(f"No model loader registered for '{name}'")
+
+        logger.info(f"Loading model '{name}'...")
+        rss_before = _current_rss_bytes()
+        start_time = time.time()
+        model = _loaders[name]()
+        load_seconds = time.time() - start_time
+        rss_delta = max(_current_rss_bytes() - rss_before, 0)
+
+        handle = ModelHandle(name, model, load_seconds, rss_delta)
+        _handles[name] = handle
+        logger.info(f"Loaded model '{name}' in {load_seconds:.2f}s "
+                    f"(+{rss_delta / (1024 * 1024):.1f} MB RSS)")
+        return handle
+
+
+def model_stats():
+    """Return load time and memory figures for every model loaded so far."""
+    return {name: handle.stats() for name, handle in _handles.items()}
+
+
+def warm_up(names=None):
+    """Eagerly load the given models (all registered ones by default).
+
+    Failures are logged rather than raised so the app can still serve
+    routes that do not need the missing model.
+    """
+    loaded = {}
+    for name in (names or list(_loaders)):
+        try:
+            loaded[name] = get_model(name).stats()
+        except Exception as e:
+            logger.warning(f"Could not warm up model '{name}': {e}")
+    return loaded
+
+
+def get_yolo_path():
+    return os.getenv('YOLO_PATH', os.path.join(BASE_DIR, 'segmentation', 'documents-segment-classification-main', 'yolo-coco'))
+
+
+def yolo_class_names():
+    """Class names from classes.names, read without loading the network."""
+    with open(os.path.join(get_yolo_path(), "classes.names"), 'r') as f:
+        return f.read().strip().split("\n")
+
+
+def yolo_fingerprint():
+    """Identify the YOLO model files and detector engine without hashing the large weights."""
+    from your_colab_code.detector_engine import engine_settings
+
+    yolo_path = get_yolo_path()
+    hasher = hashlib.sha256(engine_settings(yolo_path).encode())
+    for filename in ("yolov8.cfg", "classes.names"):
+        path = os.path.join(yolo_path, filename)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                hasher.update(f.read())
+    weights_path = os.path.join(yolo_path, "yolov8.weights")
+    if os.path.exists(weights_path):
+        hasher.update(str(os.path.getsize(weights_path)).encode())
+    return hasher.hexdigest()[:12]
+
+
+def _load_yolo():
+    import numpy as np
+    from your_colab_code.detector_engine import create_engine
+
+    yolo_path = get_yolo_path()
+    labels_path = os.path.join(yolo_path, "classes.names")
+    if not os.path.exists(labels_path):
+        raise FileNotFoundError(f"YOLO labels file not found: {labels_path}")
+
+    labels = yolo_class_names()
+
+    rng = np.random.RandomState(42)
+    colors = rng.randint(0, 255, size=(len(labels), 3), dtype="uint8")
+
+    print("[INFO] Loading YOLO model from disk...")
+    engine = create_engine(yolo_path)
+    print(f"[INFO] YOLO detector running on {engine.name} at {engine.input_size}x{engine.input_size}"
+          f"{' (INT8)' if engine.int8 else ''}")
+
+    return {
+        'engine': engine,
+        'labels': labels,
+        'colors': colors,
+    }
+
+
+def _load_latex_ocr():
+    """Build LatexOCR from absolute paths, without its chdir.
+
+    LatexOCR.__init__ is wrapped in pix2tex's in_model_path(), which
+    chdirs the whole process into the package's model directory so the
+    relative config, checkpoint and tokenizer paths resolve. Jobs load the
+    model next to request threads doing relative-path I/O, so the wrapped
+    __init__ is called directly with those paths made absolute.
+    """
+    from argparse import Namespace
+    import pix2tex
+    from pix2tex.cli import LatexOCR
+    from pix2tex.model.checkpoints.get_latest_checkpoint import download_checkpoints
+
+    model_dir = os.path.join(os.path.dirname(pix2tex.__file__), 'model')
+    arguments = Namespace(config=os.path.join(model_dir, 'settings', 'config.yaml'),
+                          checkpoint=os.path.join(model_dir, 'checkpoints', 'weights.pth'),
+                          tokenizer=os.path.join(model_dir, 'dataset', 'tokenizer.json'),
+                          no_cuda=True, no_resize=False)
+    if not os.path.exists(arguments.checkpoint):
+        # Writes next to its own module, not relative to the working directory
+        download_checkpoints()
+
+    init = getattr(LatexOCR.__init__, '__wrapped__', None)
+    if init is None:
+        logger.warning("This pix2tex version's LatexOCR cannot be built without changing the working directory")
+        return LatexOCR()
+    latex_ocr = LatexOCR.__new__(LatexOCR)
+    init(latex_ocr, arguments)
+    return latex_ocr
+
+
+register_loader('yolo', _load_yolo)
+register_loader('latex_ocr', _load_latex_ocr)
@@ -0,0 +1,216 @@
+import os
+import math
+import queue
+import re
+import subprocess
+import threading
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+from pdf2image.exceptions import PDFPageCountError
+
+PAGE_SOURCE_MAX_MEMORY_MB = int(os.getenv('PAGE_SOURCE_MAX_MEMORY_MB', '512'))
+PAGE_SOURCE_CHUNK_SIZE = int(os.getenv('PAGE_SOURCE_CHUNK_SIZE', '8'))
+
+# Upper bound on page numbers in a range, so '1-999999999' cannot build a huge set
+MAX_PAGE_NUMBER = 100000
+
+# Seconds allowed for pdftoppm to rasterize one region
+REGION_RENDER_TIMEOUT = 60
+
+# US letter, used when pdfinfo does not report a page size
+_DEFAULT_PAGE_SIZE_PTS = (612.0, 792.0)
+
+
+def parse_page_ranges(spec):
+    """Parse '40-45' or '1,3,5-7' into a sorted list of 1-based page numbers."""
+    pages = set()
+    for part in str(spec).replace(' ', '').split(','):
+        if not part:
+            continue
+        match = re.fullmatch(r'(\d+)(?:-(\d+))?', part)
+        if not match:
+            raise ValueError(f"Invalid page range '{part}'; use e.g. 40-45 or 1,3,5-7")
+        start = int(match.group(1))
+        end = int(match.group(2) or start)
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range '{part}'; pages start at 1")
+        if end > MAX_PAGE_NUMBER:
+            raise ValueError(f"Invalid page range '{part}'; pages go up to {MAX_PAGE_NUMBER}")
+        pages.update(range(start, end + 1))
+    if not pages:
+        raise ValueError("No pages selected")
+    return sorted(pages)
+
+
+def format_page_ranges(pages):
+    """Inverse of parse_page_ranges: [1, 2, 3, 7] -> '1-3,7'."""
+    return ','.join(f"{start}-{end}" if start != end else str(start) for start, end in _runs(pages))
+
+
+def check_page_numbers(pages, page_count):
+    """Raise ValueError if any of `pages` is past the end of a `page_count`-page document."""
+    outside = [page for page in pages if page > page_count]
+    if outside:
+        raise ValueError(f"Pages {format_page_ranges(outside)} are outside the document, "
+                         f"which has {page_count} page{'s' if page_count != 1 else ''}")
+
+
+def check_pages_exist(pdf_path, pages):
+    """Check requested 1-based `pages` against the page count pdfinfo reports."""
+    if not pages:
+        return
+    try:
+        page_count = int(pdfinfo_from_path(pdf_path)['Pages'])
+    except PDFPageCountError as e:
+        raise ValueError(f"Could not read the PDF's page count: {e}")
+    check_page_numbers(pages, page_count)
+
+
+def _runs(pages):
+    """Group sorted page numbers into contiguous (start, end) runs."""
+    runs = []
+    for page in pages:
+        if runs and page == runs[-1][1] + 1:
+            runs[-1][1] = page
+        else:
+            runs.append([page, page])
+    return [tuple(run) for run in runs]
+
+
+def scale_box(box, from_dpi, to_dpi, margin=0):
+    """Map an (x, y, w, h) pixel box on a `from_dpi` render to a `to_dpi` render.
+
+    `margin` (in `from_dpi` pixels) pads every side, so glyphs clipped by
+    a tight detection box are kept. The box is rounded outwards.
+    """
+    scale = to_dpi / from_dpi
+    x, y, w, h = box
+    left = max(0, math.floor((x - margin) * scale))
+    top = max(0, math.floor((y - margin) * scale))
+    right = math.ceil((x + w + margin) * scale)
+    bottom = math.ceil((y + h + margin) * scale)
+    return left, top, right - left, bottom - top
+
+
+def render_region(pdf_path, page, box, dpi, output_path):
+    """Rasterize only `box` (x, y, w, h pixels at `dpi`) of 1-based `page` to a PNG.
+
+    pdftoppm's -x/-y/-W/-H cropping renders just that area, so a high-DPI
+    crop costs a fraction of rendering the whole page at that resolution.
+    The file appears at `output_path` atomically.
+    """
+    x, y, w, h = box
+    root, _ = os.path.splitext(output_path)
+    prefix = f"{root}.{threading.get_ident()}.tmp"
+    command = [
+        'pdftoppm', '-png', '-singlefile', '-r', str(dpi),
+        '-f', str(page), '-l', str(page),
+        '-x', str(x), '-y', str(y), '-W', str(w), '-H', str(h),
+        pdf_path, prefix,
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, timeout=REGION_RENDER_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"pdftoppm failed on page {page}: {result.stderr.strip()}")
+    os.replace(f"{prefix}.png", output_path)
+    return output_path
+
+
+def _page_size_pts(info):
+    match = re.match(r'\s*([\d.]+)\s*x\s*([\d.]+)', str(info.get('Page size', '')))
+    if not match:
+        return _DEFAULT_PAGE_SIZE_PTS
+    return float(match.group(1)), float(match.group(2))
+
+
+class PdfPageSource:
+    """Lazily rasterize a PDF in chunks of pages instead of all at once.
+
+    Pages are rendered with pdftoppm `chunk_size` at a time via
+    first_page/last_page. Later chunks render on a background thread while
+    the caller works on the current one, so at most three chunks are alive
+    at once (consumed, queued, rendering); the chunk size is capped so that
+    those stay under `max_memory_mb` of decoded RGB pixels.
+
+    `pages` (1-based page numbers, e.g. from parse_page_ranges) restricts
+    rendering to those pages; pdftoppm is never asked for the others, and
+    a page past the end of the document raises ValueError. Iterating
+    yields (page_idx, PIL image) with a zero-based page index.
+    """
+
+    def __init__(self, pdf_path, dpi, max_memory_mb=None, chunk_size=None,
+                 first_page=None, last_page=None, fmt='ppm', pages=None):
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+        self.pdf_path = pdf_path
+        self.dpi = dpi
+        self.fmt = fmt
+
+        info = pdfinfo_from_path(pdf_path)
+        total_pages = int(info['Pages'])
+        self.first_page = max(1, first_page or 1)
+        self.last_page = min(total_pages, last_page or total_pages)
+        if pages is None:
+            pages = range(self.first_page, self.last_page + 1)
+        check_page_numbers(pages, total_pages)
+        self.pages = sorted({page for page in pages if self.first_page <= page <= self.last_page})
+        self.page_count = len(self.pages)
+
+        width_pts, height_pts = _page_size_pts(info)
+        self.page_bytes = int((width_pts / 72 * dpi) * (height_pts / 72 * dpi) * 3)
+
+        max_memory_mb = max_memory_mb or PAGE_SOURCE_MAX_MEMORY_MB
+        budget_pages = (max_memory_mb * 1024 * 1024) // (3 * max(self.page_bytes, 1))
+        self.chunk_size = max(1, min(chunk_size or PAGE_SOURCE_CHUNK_SIZE, budget_pages))
+
+    def __len__(self):
+        return self.page_count
+
+    def _chunks(self):
+        for run_start, run_end in _runs(self.pages):
+            for start in range(run_start, run_end + 1, self.chunk_size):
+                yield start, min(start + self.chunk_size - 1, run_end)
+
+    def _render(self, start, end):
+        return convert_from_path(self.pdf_path, dpi=self.dpi, first_page=start, last_page=end, fmt=self.fmt)
+
+    def __iter__(self):
+        if self.page_count == 0:
+            return
+
+        rendered = queue.Queue(maxsize=1)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    rendered.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def producer():
+            try:
+                for start, end in self._chunks():
+                    if not put((start, self._render(start, end))):
+                        return
+                put(None)
+            except Exception as e:
+                put(e)
+
+        thread = threading.Thread(target=producer, name='pdf-page-source', daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = rendered.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                start, pages = item
+                for offset, page in enumerate(pages):
+                    yield start - 1 + offset, page
+                del pages, item
+        finally:
+            stop.set()
@@ -0,0 +1,277 @@
+import os
+import time
+import queue
+import threading
+import contextvars
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '16'))
+
+_DONE = object()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_process_pool(name, workers, initializer=None, initargs=()):
+    """Return this process's long-lived worker pool called `name`, starting it on first use.
+
+    Workers are spawned rather than forked: the web process runs many
+    threads, and a fresh interpreter loads its models once in
+    `initializer` and then serves every later job. Pools are per process,
+    so a gunicorn worker never reuses one inherited from the master.
+    """
+    key = (name, os.getpid())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=initializer, initargs=initargs)
+            _pools[key] = pool
+        return pool
+
+
+def discard_process_pool(name, pool):
+    """Forget a broken pool so the next job starts a new one."""
+    with _pools_lock:
+        if _pools.get((name, os.getpid())) is pool:
+            del _pools[(name, os.getpid())]
+    pool.shutdown(wait=False)
+
+
+class Stage:
+    """One step of a StagedPipeline.
+
+    `func` receives a list of up to `batch_size` items and returns an
+    iterable of items for the next stage (or None). It runs on `workers`
+    threads, or in the long-lived process pool `pool` (default: the stage
+    name) when executor='process'; process stages need a picklable,
+    module-level `func`, and `initializer(*initargs)` runs once in each
+    pool process.
+
+    With a `batch_key`, items are held back until `batch_size` of them
+    share a key, so a batch can span pages; whatever is left is flushed
+    once the input ends.
+    """
+
+    def __init__(self, name, func, workers=1, batch_size=1, executor='thread', queue_size=None,
+                 batch_key=None, pool=None, initializer=None, initargs=()):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor '{executor}' for stage {name}")
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.executor = executor
+        self.queue_size = queue_size
+        self.batch_key = batch_key
+        self.pool = pool or name
+        self.initializer = initializer
+        self.initargs = initargs
+
+        self.processed = 0
+        self.emitted = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+        self.first_item_at = None
+        self.finished_at = None
+        self._queue = None
+        self._buckets = defaultdict(list)
+        self._drained = False
+        self._lock = threading.Lock()
+
+    def stats(self):
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            return {
+                'executor': self.executor,
+                'workers': self.workers,
+                'queue_depth': self._queue.qsize() if self._queue is not None and not self.finished_at else 0,
+                'processed': self.processed,
+                'emitted': self.emitted,
+                'batches': self.batches,
+                'busy_seconds': round(self.busy_seconds, 3),
+                'wall_seconds': round(end - self.first_item_at, 3) if self.first_item_at else 0.0,
+                'items_per_second': round(self.processed / elapsed, 3) if elapsed > 0 else 0.0,
+                'done': self.finished_at is not None,
+            }
+
+
+class StagedPipeline:
+    """Run items through stages connected by bounded queues.
+
+    Every stage has its own worker pool, so a page's crops can be OCR'd
+    while later pages are still being detected. Bounded queues apply
+    back-pressure: a fast stage blocks instead of piling work up in memory.
+    `on_stats(stats)` is called (at most once per `stats_interval`
+    seconds) with per-stage queue depth and throughput.
+    """
+
+    def __init__(self, stages, queue_size=None, on_stats=None, stats_interval=1.0):
+        self.stages = stages
+        self.queue_size = queue_size or PIPELINE_QUEUE_SIZE
+        self.on_stats = on_stats
+        self.stats_interval = stats_interval
+        self._last_stats = 0.0
+        self._error = None
+        self._abort = threading.Event()
+
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    def _publish_stats(self, force=False):
+        if not self.on_stats:
+            return
+        now = time.time()
+        if force or now - self._last_stats >= self.stats_interval:
+            self._last_stats = now
+            self.on_stats(self.stats())
+
+    def _fail(self, stage, error):
+        if self._error is None:
+            self._error = error
+            print(f"Pipeline stage '{stage.name}' failed: {error}")
+        self._abort.set()
+
+    def _put(self, q, item):
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _next_batch(self, stage):
+        """Block for one item, then take whatever else is ready up to batch_size."""
+        first = stage._queue.get()
+        if first is _DONE:
+            return [], True
+        batch = [first]
+        while len(batch) < stage.batch_size:
+            try:
+                item = stage._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _next_keyed_batch(self, stage):
+        """Buffer items by batch_key until a bucket is full; flush the rest at end of stream."""
+        while True:
+            with stage._lock:
+                for key, bucket in stage._buckets.items():
+                    if len(bucket) >= stage.batch_size or stage._drained:
+                        batch = bucket[:stage.batch_size]
+                        del bucket[:stage.batch_size]
+                        if not bucket:
+                            del stage._buckets[key]
+                        return batch, False
+                if stage._drained:
+                    return [], True
+            item = stage._queue.get()
+            with stage._lock:
+                if item is _DONE:
+                    stage._drained = True
+                else:
+                    stage._buckets[stage.batch_key(item)].append(item)
+
+    def _worker(self, stage, output, pool, finished):
+        next_batch = self._next_keyed_batch if stage.batch_key else self._next_batch
+        while True:
+            batch, done = next_batch(stage)
+            if batch and not self._abort.is_set():
+                start_time = time.time()
+                with stage._lock:
+                    if stage.first_item_at is None:
+                        stage.first_item_at = start_time
+                try:
+                    if pool is not None:
+                        results = pool.submit(stage.func, batch).result()
+                    else:
+                        results = stage.func(batch)
+                    results = list(results or [])
+                except BrokenProcessPool as e:
+                    discard_process_pool(stage.pool, pool)
+                    self._fail(stage, e)
+                    results = []
+                except Exception as e:
+                    self._fail(stage, e)
+                    results = []
+                with stage._lock:
+                    stage.processed += len(batch)
+                    stage.emitted += len(results)
+                    stage.batches += 1
+                    stage.busy_seconds += time.time() - start_time
+                for result in results:
+                    if not self._put(output, result):
+                        break
+                self._publish_stats()
+            if done:
+                # Let sibling workers see the end of the stream too
+                stage._queue.put(_DONE)
+                finished()
+                return
+
+    def run(self, source):
+        """Feed `source` through the stages and return the last stage's outputs."""
+        queues = [queue.Queue(maxsize=stage.queue_size or self.queue_size) for stage in self.stages]
+        results = queue.Queue()
+        outputs = queues[1:] + [results]
+        threads = []
+
+        for stage, inbox, outbox in zip(self.stages, queues, outputs):
+            stage._queue = inbox
+            stage.started_at = time.time()
+            pool = None
+            if stage.executor == 'process':
+                pool = get_process_pool(stage.pool, stage.workers, stage.initializer, stage.initargs)
+
+            remaining = [stage.workers]
+            remaining_lock = threading.Lock()
+
+            def finished(stage=stage, outbox=outbox, remaining=remaining, remaining_lock=remaining_lock):
+                with remaining_lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    stage.finished_at = time.time()
+                    outbox.put(_DONE)
+
+            for i in range(stage.workers):
+                # Workers inherit the caller's context (e.g. the job id spans are tagged with)
+                context = contextvars.copy_context()
+                thread = threading.Thread(target=context.run, args=(self._worker, stage, outbox, pool, finished),
+                                          name=f"pipeline-{stage.name}-{i}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        try:
+            for item in source:
+                if not self._put(queues[0], item):
+                    break
+        except Exception as e:
+            self._fail(self.stages[0], e)
+        queues[0].put(_DONE)
+
+        collected = []
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            collected.append(item)
+
+        for thread in threads:
+            thread.join()
+        self._publish_stats(force=True)
+
+        if self._error is not None:
+            raise self._error
+        return collected
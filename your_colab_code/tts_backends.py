@@ -0,0 +1,86 @@
+import os
+import shutil
+import subprocess
+
+TTS_BACKEND = os.getenv('TTS_BACKEND', 'gtts')
+TTS_VOICE = os.getenv('TTS_VOICE', '')
+TTS_WORKERS = int(os.getenv('TTS_WORKERS', '4'))
+PIPER_MODEL = os.getenv('PIPER_MODEL', '')
+
+
+class TtsBackend:
+    """Turns a string into an audio file. Subclasses set name and extension."""
+
+    name = None
+    extension = 'mp3'
+    default_voice = ''
+
+    def __init__(self, lang='en', voice=None):
+        self.lang = lang
+        self.voice = voice or self.default_voice
+
+    def synthesize(self, text, path):
+        raise NotImplementedError
+
+
+class GttsBackend(TtsBackend):
+    """Google Translate TTS over the network; `voice` is the Google domain (tld)."""
+
+    name = 'gtts'
+    extension = 'mp3'
+    default_voice = 'com'
+
+    def synthesize(self, text, path):
+        from gtts import gTTS
+        gTTS(text=text, lang=self.lang, tld=self.voice).save(path)
+
+
+class EspeakBackend(TtsBackend):
+    """Local espeak-ng synthesis; runs entirely on the box."""
+
+    name = 'espeak-ng'
+    extension = 'wav'
+    binary = 'espeak-ng'
+
+    def __init__(self, lang='en', voice=None):
+        super().__init__(lang, voice or lang)
+        if shutil.which(self.binary) is None:
+            raise RuntimeError(f"{self.binary} is not installed")
+
+    def synthesize(self, text, path):
+        subprocess.run([self.binary, '-v', self.voice, '-w', path, '--stdin'],
+                       input=text, text=True, check=True, capture_output=True)
+
+
+class PiperBackend(TtsBackend):
+    """Local neural synthesis with piper; `voice` is the path to a .onnx voice model."""
+
+    name = 'piper'
+    extension = 'wav'
+    binary = 'piper'
+
+    def __init__(self, lang='en', voice=None):
+        super().__init__(lang, voice or PIPER_MODEL)
+        if shutil.which(self.binary) is None:
+            raise RuntimeError(f"{self.binary} is not installed")
+        if not self.voice or not os.path.exists(self.voice):
+            raise RuntimeError("Set PIPER_MODEL (or TTS_VOICE) to a piper voice model file")
+
+    def synthesize(self, text, path):
+        subprocess.run([self.binary, '--model', self.voice, '--output_file', path],
+                       input=text, text=True, check=True, capture_output=True)
+
+
+TTS_BACKENDS = {
+    GttsBackend.name: GttsBackend,
+    EspeakBackend.name: EspeakBackend,
+    PiperBackend.name: PiperBackend,
+}
+
+
+def get_tts_backend(name=None, lang='en', voice=None):
+    """Build the configured TTS backend (TTS_BACKEND, default gtts)."""
+    name = name or TTS_BACKEND
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS backend '{name}'. Choose one of: {', '.join(TTS_BACKENDS)}")
+    return TTS_BACKENDS[name](lang=lang, voice=voice or TTS_VOICE or None)
@@ -0,0 +1,122 @@
+import os
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tracing import span
+
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join('static', 'tts_cache'))
+# Quota the retention sweeper keeps TTS_CACHE_DIR under
+TTS_CACHE_MAX_MB = int(os.getenv('TTS_CACHE_MAX_MB', '512'))
+
+
+class TtsCache:
+    """Content-addressed store of synthesized audio shared by all jobs.
+
+    A clip is keyed by (text, lang, engine, voice) and stored once as
+    <sha256>.mp3; repeated strings such as page numbers and headings are
+    served from disk instead of being synthesized again. A clip's mtime is
+    refreshed on every hit. Clips are only deleted by the retention
+    sweeper, least recently used first and never while a cached or stored
+    result still points at them.
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+
+    @staticmethod
+    def make_key(text, lang, engine, voice):
+        material = '\0'.join((engine, voice or '', lang, text))
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def path_for(self, key, extension='mp3'):
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def get_or_create(self, text, lang, engine, voice, synthesize, extension='mp3'):
+        """Return the clip for `text`, calling synthesize(text, path) on a miss."""
+        path = self.path_for(self.make_key(text, lang, engine, voice), extension)
+        if os.path.exists(path):
+            try:
+                os.utime(path)
+                with self._lock:
+                    self.hits += 1
+                return path
+            except OSError:
+                pass  # evicted between the check and the touch
+
+        with self._lock:
+            self.misses += 1
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with span('tts', engine=engine):
+                synthesize(text, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def synthesize_many(self, texts, lang, engine, voice, synthesize, extension='mp3', on_clip=None, workers=1):
+        """Return one clip path per text (None where synthesis failed).
+
+        Identical texts within the call are synthesized once, and distinct
+        texts are synthesized on up to `workers` threads. `on_clip(done)` is
+        called after each distinct text is resolved.
+        """
+        unique = list(dict.fromkeys(texts))
+        with self._lock:
+            self.deduplicated += len(texts) - len(unique)
+
+        clips = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='tts') as executor:
+            futures = {executor.submit(contextvars.copy_context().run, self.get_or_create,
+                                       text, lang, engine, voice, synthesize, extension): text
+                       for text in unique}
+            for done, future in enumerate(as_completed(futures), start=1):
+                text = futures[future]
+                try:
+                    clips[text] = future.result()
+                except Exception as e:
+                    print(f"Error synthesizing audio: {e}")
+                    clips[text] = None
+                if on_clip:
+                    on_clip(done)
+        return [clips[text] for text in texts]
+
+    def stats(self):
+        total_bytes = 0
+        clips = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    total_bytes += entry.stat().st_size
+                    clips += 1
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'deduplicated': self.deduplicated,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'clips': clips,
+            'size_mb': round(total_bytes / (1024 * 1024), 1),
+            'max_mb': TTS_CACHE_MAX_MB,
+        }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_tts_cache():
+    """Return the process-wide TtsCache."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = TtsCache()
+        return _shared_cache
@@ -0,0 +1,68 @@
+import numpy as np
+import cv2
+
+CONFIDENCE_THRESHOLD = 0.5
+NMS_THRESHOLD = 0.3
+
+
+def decode_yolo_outputs(layer_outputs, width, height, conf_threshold=CONFIDENCE_THRESHOLD):
+    """Decode raw YOLO layer outputs for one image in a few array operations.
+
+    Each row of a layer output is (cx, cy, w, h, objectness, class scores...)
+    in coordinates relative to the image. Rows whose best class score does not
+    exceed `conf_threshold` are dropped before any box math is done.
+
+    Returns (boxes, confidences, class_ids) where boxes is an (N, 4) int32
+    array of [x, y, w, h] in pixels.
+    """
+    detections = np.concatenate([np.asarray(output).reshape(-1, output.shape[-1])
+                                 for output in layer_outputs])
+    scores = detections[:, 5:]
+    class_ids = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+
+    keep = confidences > conf_threshold
+    detections = detections[keep]
+    confidences = confidences[keep].astype(np.float32)
+    class_ids = class_ids[keep].astype(np.int32)
+
+    scaled = (detections[:, 0:4] * np.array([width, height, width, height], dtype=np.float64)).astype(np.int32)
+    boxes = np.empty_like(scaled)
+    boxes[:, 0] = (scaled[:, 0] - scaled[:, 2] / 2).astype(np.int32)
+    boxes[:, 1] = (scaled[:, 1] - scaled[:, 3] / 2).astype(np.int32)
+    boxes[:, 2:4] = scaled[:, 2:4]
+
+    return boxes, confidences, class_ids
+
+
+def class_aware_nms(boxes, confidences, class_ids, conf_threshold=CONFIDENCE_THRESHOLD, nms_threshold=NMS_THRESHOLD):
+    """Run non-maximum suppression separately for each class in one call.
+
+    Returns the indices of the kept detections, highest confidence first.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int32)
+
+    if hasattr(cv2.dnn, 'NMSBoxesBatched'):
+        indices = cv2.dnn.NMSBoxesBatched(boxes.tolist(), confidences.tolist(), class_ids.tolist(),
+                                          conf_threshold, nms_threshold)
+    else:
+        # Shift every class into its own coordinate range so boxes of
+        # different classes can never overlap, then run plain NMS once.
+        offset = int((boxes[:, 0:2] + boxes[:, 2:4]).max() - boxes[:, 0:2].min()) + 1
+        shifted = boxes.copy()
+        shifted[:, 0:2] += (class_ids * offset)[:, None]
+        indices = cv2.dnn.NMSBoxes(shifted.tolist(), confidences.tolist(), conf_threshold, nms_threshold)
+
+    return np.asarray(indices, dtype=np.int32).flatten()
+
+
+def detect_objects(layer_outputs, width, height, conf_threshold=CONFIDENCE_THRESHOLD, nms_threshold=NMS_THRESHOLD):
+    """Decode and suppress YOLO outputs for one image.
+
+    Returns a list of (x, y, w, h, confidence, class_id) tuples.
+    """
+    boxes, confidences, class_ids = decode_yolo_outputs(layer_outputs, width, height, conf_threshold)
+    indices = class_aware_nms(boxes, confidences, class_ids, conf_threshold, nms_threshold)
+    return [(int(boxes[i, 0]), int(boxes[i, 1]), int(boxes[i, 2]), int(boxes[i, 3]),
+             float(confidences[i]), int(class_ids[i])) for i in indices]